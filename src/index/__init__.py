@@ -3,18 +3,37 @@
 # Stan 2024-12-25
 
 import configparser
+import gc
 import json
 import os
 import re
+import sys
 import tempfile
+from datetime import datetime
 # import warnings
 from importlib import import_module
 from zipfile import ZipFile
 
+from .memory import MemoryBudget
 from .timer import Timer
+from .tracer import tracer, span
+from .workqueue import WorkQueue
+from .workqueue import LeaseLost
 from .db import Db
+from .db import resolve_connection_options
+from .log import log, fields
+from .log import setup as setup_logging
+from .log import shutdown as shutdown_logging
+from .utils import get_file_hash
 from .utils import get_memory_info
+from .utils import get_seekable
+from .utils import spool
+from .utils import skip_exc
 from .print_once import print_once
+from .preview import main_preview
+from .progress import Progress
+from .cache import get_cache
+from . import search
 
 
 def main(**kargs):
@@ -24,17 +43,48 @@ def main(**kargs):
 
 #   warnings.simplefilter('always', DeprecationWarning)
 
-    # Db object
-    db = Db(**kargs)
-    if db.debug:
-        print(db, end="\n\n")
+    # Logging
+    level = kargs.get('log_level') or ('DEBUG' if kargs.get('debug') else 'INFO')
+    setup_logging(level.upper(), kargs.get('log_json'))
+
+    # Tracing
+    trace = kargs.get('trace')
+    if trace:
+        tracer.enable(trace)
+
+    try:
+        run(**kargs)
 
+    finally:
+        if trace:
+            count = tracer.close()
+            if kargs.get('verbose'):
+                log.info(f"Trace saved: '{trace}' ({count} events)")
+
+        shutdown_logging()
+
+
+def index_stream(fileobj, name, **kargs):
+    """
+    Process a workbook given as bytes or a file object (no path needed),
+    the extension of `name` selects the format reader.
+    Other arguments are the same as of `main`.
+    """
+    return main(filename='-', fileobj=fileobj, name=name, **kargs)
+
+
+def run(**kargs):
     # Resolve config path
     filename = kargs.get('filename')
     config   = kargs.get('config')
 
+    # Standard input or `index_stream`, config is looked up in the current dir
+    stream = filename == '-'
+
     fullname = os.path.abspath(filename)
-    if os.path.isfile(fullname):
+    if stream:
+        dirname = os.getcwd()
+    elif os.path.isfile(fullname):
         dirname = os.path.dirname(fullname)
     else:
         dirname = fullname.rstrip('/')
@@ -54,50 +104,164 @@ def main(**kargs):
     if config_file:
         parser_options = load_options(config_file)
 
-    # Handle filename
-    if os.path.isfile(filename):
-        if db.verbose:
-            print(f"=== Filename: {filename} ===")
+    # Db object
+    db = Db(**dict(kargs, **resolve_connection_options(kargs, parser_options)))
+    if db.debug:
+        log.info(f"{db}\n")
+
+    if db.rebuild and (kargs.get('coordinator') or kargs.get('worker')):
+        raise ValueError("Rebuild mode cannot be used with a work queue")
+
+    # Files completed before are skipped and would be missing in the shadow
+    if db.rebuild and (db.resume or parser_options.get('resume')):
+        raise ValueError("Rebuild mode cannot be used with resume")
+
+    if stream and (kargs.get('coordinator') or kargs.get('worker') or kargs.get('preview')):
+        raise ValueError("A stream cannot be used with a work queue or preview mode")
+
+    # Sheet names, dimensions and first rows only, nothing is indexed
+    preview = kargs.get('preview')
+    if preview:
+        if db.rebuild or kargs.get('coordinator') or kargs.get('worker'):
+            raise ValueError("Preview mode cannot be used with rebuild or a work queue")
 
-        # Resolve parser
         external_parser = parser_options.get('external_parser')
         variant = parser_options.get('variant', 1)
 
         module_name = external_parser or f".index_{variant:03}"
         parser = import_module(module_name, __package__)
-        if db.debug:
-            print(f"=== Parser: {parser.__file__} ===")
 
-        # Reg task
-        saved, t_id = db.reg_task(parser, parser_options)
+        main_preview(os.path.abspath(filename), db, parser, parser_options,
+                     preview, kargs.get('preview_report'))
+        return
 
-        filename = os.path.abspath(filename)
-        main_file(filename, db, parser, parser_options)
+    started = datetime.utcnow()
 
-    else:
-        if db.verbose:
-            print(f"=== Dirname: {filename} ===")
+    # Handle filename
+    try:
+        if stream:
+            name = kargs.get('name')
+            if not name:
+                raise ValueError("A name with the extension is required for a stream")
+
+            if db.verbose:
+                log.info(f"=== Stream: {name} ===")
+
+            # Resolve parser
+            external_parser = parser_options.get('external_parser')
+            variant = parser_options.get('variant', 1)
+
+            module_name = external_parser or f".index_{variant:03}"
+            parser = import_module(module_name, __package__)
+            if db.debug:
+                log.info(f"=== Parser: {parser.__file__} ===")
+
+            # Reg task
+            saved, t_id = db.reg_task(parser, parser_options)
+            db.push_connection_record()
+
+            # Small streams are kept in memory
+            spool_size = int(float(parser_options.get('spool_size', 64)) * (1 << 20))   # MB
+            fileobj = kargs.get('fileobj')
+            fileobj = get_seekable(sys.stdin.buffer if fileobj is None else fileobj, spool_size)
+
+            ok = main_file(name, db, parser, parser_options, fileobj)
+
+        elif os.path.isfile(filename):
+            if db.verbose:
+                log.info(f"=== Filename: {filename} ===")
+
+            # Resolve parser
+            external_parser = parser_options.get('external_parser')
+            variant = parser_options.get('variant', 1)
 
-        filename = os.path.abspath(filename)
-        main_dir(filename, db, parser_options)
+            module_name = external_parser or f".index_{variant:03}"
+            parser = import_module(module_name, __package__)
+            if db.debug:
+                log.info(f"=== Parser: {parser.__file__} ===")
 
+            # Reg task
+            saved, t_id = db.reg_task(parser, parser_options)
+            db.push_connection_record()
 
-def main_file(filename, db, parser, parser_options):
+            filename = os.path.abspath(filename)
+            ok = main_file(filename, db, parser, parser_options)
+
+        else:
+            if db.verbose:
+                log.info(f"=== Dirname: {filename} ===")
+
+            filename = os.path.abspath(filename)
+            ok = True
+            if kargs.get('coordinator'):
+                main_coordinator(filename, db, parser_options)
+
+            elif kargs.get('worker'):
+                main_worker(filename, db, parser_options)
+
+            else:
+                ok = main_dir(filename, db, parser_options)
+
+    except:
+        if db.rebuild:
+            db.discard_rebuild()
+        raise
+
+    # Rows of failed files would be missing in the rebuilt collection
+    if db.rebuild and not ok:
+        log.error(f"Rebuild discarded, some files failed; left as is: {', '.join(db.shadows)}")
+        db.discard_rebuild()
+
+    elif db.rebuild:
+        rebuilt = list(db.shadows)
+        db.finish_rebuild(parser_options.get('indexes'))
+
+        # Values of the replaced collections
+        if int(parser_options.get('search_index') or 0):
+            search.drop_stale(db, rebuilt, started, parser_options)
+
+
+def main_file(filename, db, parser, parser_options, fileobj=None):
     cname       = parser_options.get('cname') or db.cname
     file_keys   = parser_options.get('file_keys', {})
     record_keys = parser_options.get('record_keys', {})
     proceed_anyway = parser_options.get('proceed_anyway')
     raise_after_exception = parser_options.get('raise_after_exception')
 
+    memory_limit = parser_options.get('memory_limit')     # MB
+    resume = parser_options.get('resume') or db.resume
+    search_index = int(parser_options.get('search_index') or 0)
+    dedup = parser_options.get('dedup') or db.dedup
+
+    # Parsed batches kept on disk and replayed by later runs
+    cache_dir = parser_options.get('cache_dir') or db.cache_dir
+    cache = None
+    if cache_dir:
+        cache = get_cache(cache_dir, float(parser_options.get('cache_size', 1024)))     # MB
+
     upsert_mode = parser_options.get('upsert_mode')
     upsert_keys = parser_options.get('upsert_keys') or \
                   getattr(parser, '__preferred_upsert_keys__', None)
 
-    collection = db[cname]
+    spool_size = int(float(parser_options.get('spool_size', 64)) * (1 << 20))   # MB
+
+    collection = db.target(cname)
     dirname = os.path.dirname(filename)
+    failed = False
+
+    # `_extra` history of upserted rows: last N scans, unchanged scans collapsed
+    db.extra_history = int(parser_options.get('extra_history') or 0)
+    db.extra_collapse = int(parser_options.get('extra_collapse') or 0)
 
-    # iter if archive
-    for filename, localname, source in yield_file(filename):
+    # Upserts into a shadow collection need an index on the keys
+    if db.rebuild and upsert_mode and upsert_keys:
+        collection.create_index([(k, 1) for k in upsert_keys])
+
+    # iter if archive, `localname` is a path or a file object
+    for filename, localname, source in yield_file(filename, dict(
+        localname = filename if fileobj is None else fileobj,
+        spool_size = spool_size
+    )):
         # Regular file
         if not source:
             name = os.path.basename(filename)
@@ -119,21 +283,112 @@ def main_file(filename, db, parser, parser_options):
 #           if not proceed_anyway:
 #               continue
 
-        if upsert_mode:
-            db.upsert_pre_handle(collection)
+        # Resume an interrupted run from its last committed chunk
+        db.checkpoint = None
+        if resume:
+            if db.file_is_processed():
+                if db.verbose:
+                    log.info(f"File already processed, skipping: '{filename}'")
+                continue
+
+            db.checkpoint = db.get_checkpoint()
+
+        # Identical content already parsed by the task
+        file_hash = None
+        if dedup and not db.checkpoint:
+            with span("file_hash", name=name):
+                file_hash = get_file_hash(localname)
+            db.set_file_hash(file_hash)
+
+            original = db.find_duplicate(file_hash)
+            if original:
+                if db.verbose:
+                    log.info(f"Same content as '{original['name']}', linked: '{filename}'")
+
+                db.link_duplicate(original)
+                continue
+
+        if db.checkpoint:
+            checkpoint = dict(db.checkpoint)
+            del checkpoint['_tid'], checkpoint['updated']
+            if db.verbose:
+                log.info(f"Resuming after sheet {checkpoint['_shid']}, row {checkpoint['_r']}")
+
+            if not upsert_mode:
+                db.delete_uncommitted(collection)
+
+            if search_index:
+                search.drop_uncommitted(db, cname, parser_options)
+
+        else:
+            checkpoint = dict(shids=[], _shid=None, _r=None, chunks=0,
+                              started=datetime.utcnow())
+
+            # Values of the previous scan of the file (rebuilt ones in `drop_stale`)
+            if search_index and not db.rebuild:
+                search.drop_file(db, cname, parser_options)
+
+            # New scan generation of upserted rows
+            if upsert_mode:
+                checkpoint['_gen'] = db.upsert_pre_handle(collection)
+
+            db.set_checkpoint(**checkpoint)
+
+        # An interrupted run continues its own generation
+        db.generation = checkpoint.get('_gen')
+
+        budget = MemoryBudget(memory_limit)
+        db.memory_budget = budget
 
         exception_occurred = False
-        with Timer(f"[ main_file({f_id}) ] finished", db.verbose) as t:
+        with Timer(f"[ main_file({f_id}) ] finished", db.verbose) as t, \
+             span("file", name=name, f_id=f_id):
             try:
                 total = None
                 consumption = []
 
-                for records in parser.main(localname, db, parser_options):
+                cached = None
+                if cache:
+                    if file_hash is None:
+                        with span("file_hash", name=name):
+                            file_hash = get_file_hash(localname)
+
+                    key = cache.get_key(file_hash, name, parser, parser_options)
+                    cached = cache.get(key)
+
+                if cached:
+                    if db.verbose:
+                        log.info(f"Parse cache hit: '{filename}'")
+
+                    chunks = cache.replay(cached)
+
+                else:
+                    if db.progress:
+                        db.progress.start_parse()
+
+                    if isinstance(localname, str):
+                        chunks = parser.main(localname, db, parser_options)
+                    else:
+                        chunks = parser.main(filename, db, parser_options, fileobj=localname)
+
+                # A resumed run skips committed rows, its batches are incomplete
+                if cache and not cached and not db.checkpoint:
+                    chunks = cache.store(key, chunks)
+
+                for records in chunks:
                     if isinstance(records, tuple):
 #                       warnings.warn("`parser_returns_tuple` is deprecated. Use `parser_returns_records` instead.", DeprecationWarning, stacklevel=2)
                         records, extra = records
                         records = [ dict(record, **extra) for record in records ]
 
+                    # Another worker may own the file now
+                    if db.lease:
+                        db.lease.check()
+
+                    # Parsers which cannot fast-forward
+                    if db.checkpoint:
+                        records = [ record for record in records if not db.is_committed(record) ]
+
                     if total is None:
                         total = 0
 
@@ -156,27 +411,50 @@ def main_file(filename, db, parser, parser_options):
                                 ** record_keys
                             )
 
-                        if db.debug and not total:     # First iteration
-                            print("Cumulative:", end=' ')
+                        if search_index:
+                            search.index_records(db, cname, records, parser_options)
+
+                        # Chunks are shrunk by the readers, garbage of the
+                        # written one is released before the next is read
+                        if budget.exceeded():
+                            gc.collect()
+
+                        for record in records:
+                            if record.get('_shid') not in checkpoint['shids']:
+                                checkpoint['shids'].append(record.get('_shid'))
+
+                        checkpoint.update(
+                            _shid = records[-1].get('_shid'),
+                            _r = records[-1].get('_r'),
+                            chunks = checkpoint['chunks'] + 1
+                        )
+                        db.set_checkpoint(**checkpoint)
 
                         total += len(records)
+                        if db.progress:
+                            db.progress.add_rows(len(records))
 
                         if db.debug:
-                            print(total, end=' ')
+                            log.debug(f"Cumulative: {total}", extra=fields(total=total))
 
                     else:
                         if db.verbose:
-                            print("<No records>")
-
-                if db.debug and total:     # New line after Cumulative message
-                    print()
+                            log.info("<No records>")
 
                 if db.verbose and total:
-                    print(f"Total: {total}; Grand total: { collection.estimated_document_count() }")
+                    log.info(f"Total: {total}; Grand total: { collection.estimated_document_count() }")
+
+                if db.lease:
+                    db.lease.check()
+
+            # The file is left to its new owner
+            except LeaseLost:
+                raise
 
             except Exception as ex:
                 print_once(f"Exception occurred during processing '{filename}': {ex}", key=str(ex))
                 exception_occurred = True
+                failed = True
 
                 extra = {}
                 if isinstance(ex, SyntaxError):
@@ -200,21 +478,31 @@ def main_file(filename, db, parser, parser_options):
                 if raise_after_exception:
                     raise
 
-            finally:
-                if upsert_mode:
-                    db.upsert_post_handle(collection)
-
-        if db.verbose:     # New line after Timer message
-            print()
+        if budget.triggered:
+            db.push_file_record('memory',
+                message = f"Memory limit approached: chunks shrunk to {budget.min_chunk_rows} rows",
+                ** budget.summary()
+            )
 
         if not exception_occurred:
+            # Only a complete scan tells which rows are missing
+            deleted = None
+            if upsert_mode:
+                deleted = db.upsert_post_handle(collection)
+                if db.verbose and deleted:
+                    log.info(f"Deleted rows: {deleted}")
+
+            db.clear_checkpoint()
             db.push_file_record(
                 'skipped' if total is None else 'completed',
                 total = total,
+                deleted = deleted,
                 __consumption = consumption,
                 elapsed = t.elapsed
             )
 
+    return not failed
+
 
 def yield_file(filename, extra_info={}):
     _, ext = os.path.splitext(filename)
@@ -222,8 +510,26 @@ def yield_file(filename, extra_info={}):
 
     localname = extra_info.get('localname', filename)
     source    = extra_info.get('source', [])
-
-    if ext == '.zip':
+    spool_size = extra_info.get('spool_size', 64 << 20)
+
+    if ext == '.zip' and not isinstance(localname, str):
+        # Items of a stream are kept in memory up to `spool_size`
+        with ZipFile(localname) as zipf:
+            for info in zipf.infolist():
+                if info.file_size:
+                    filepath = filename if source else os.path.basename(filename)
+
+                    with zipf.open(info) as f:
+                        buffer = spool(f, spool_size)
+
+                    with buffer:
+                        yield from yield_file(info.filename, {
+                            'localname': buffer,
+                            'source': source + [filepath],
+                            'spool_size': spool_size
+                        })
+
+    elif ext == '.zip':
         with tempfile.TemporaryDirectory(dir=tempfile.gettempdir()) as temp_dir:
             with ZipFile(localname) as zipf:
                 for info in zipf.infolist():
@@ -234,7 +540,8 @@ def yield_file(filename, extra_info={}):
 
                         for filename1, localname1, source1 in yield_file(info.filename, {
                             'localname': zipf.extract(info.filename, path=temp_dir, pwd=None),
-                            'source': source + [filepath]
+                            'source': source + [filepath],
+                            'spool_size': spool_size
                         }):
                             yield filename1, localname1, source1
 
@@ -250,19 +557,133 @@ def main_dir(dirname, db, parser_options):
     module_name = external_parser or f".index_{variant:03}"
     parser = import_module(module_name, __package__)
     if db.debug:
-        print(f"=== Parser: {parser.__file__} ===")
+        log.info(f"=== Parser: {parser.__file__} ===")
 
     # Reg task
     saved, t_id = db.reg_task(parser, parser_options)
-
-    with Timer("[ main_dir ] finished", db.verbose) as t:
-        for root, dirs, files in os.walk(dirname):
-            for name in files:
-                filename = os.path.join(root, name)
+    db.push_connection_record()
+
+    # Size of the job for progress and ETA
+    with span("scan", dirname=dirname):
+        filenames = [os.path.join(root, name)
+                     for root, dirs, files in os.walk(dirname)
+                     for name in files]
+        sizes = [skip_exc(lambda: os.path.getsize(filename), 0) for filename in filenames]
+
+    if db.verbose:
+        log.info(f"Files: {len(filenames)}; size: {sum(sizes) / (1 << 20):.1f} MB")
+
+    progress = Progress(db, len(filenames), sum(sizes),
+                        float(parser_options.get('progress_interval', 10)))     # seconds
+
+    failed = 0
+    with Timer("[ main_dir ] finished", db.verbose) as t, \
+         span("main_dir", dirname=dirname), \
+         progress:
+        db.progress = progress
+        try:
+            for filename, size in zip(filenames, sizes):
                 if db.verbose:
-                    print(f"Filename: {filename}")
+                    log.info(f"Filename: {filename}")
+
+                progress.start_file(filename)
+                if not main_file(filename, db, parser, parser_options):
+                    failed += 1
+
+                progress.finish_file(size)
+
+        finally:
+            db.progress = None
+
+    if failed:
+        log.warning(f"Failed files: {failed}")
+
+    return not failed
+
+
+def main_coordinator(dirname, db, parser_options):
+    # Resolve parser
+    external_parser = parser_options.get('external_parser')
+    variant = parser_options.get('variant', 1)
+
+    module_name = external_parser or f".index_{variant:03}"
+    parser = import_module(module_name, __package__)
+
+    # Reg task, workers with the same parser and options share it
+    saved, t_id = db.reg_task(parser, parser_options)
+
+    queue = WorkQueue(db, parser_options.get('queue_cname', '_queue'))
+
+    paths = []
+    for root, dirs, files in os.walk(dirname):
+        for name in files:
+            paths.append(os.path.relpath(os.path.join(root, name), dirname))
+
+    with Timer("[ main_coordinator ] enqueued", db.verbose) as t:
+        added = queue.enqueue(paths, dirname)
+
+    db.push_task_record('enqueued',
+        dirname = dirname,
+        files = len(paths),
+        added = added
+    )
+
+    log.info(f"Task: {t_id}; files: {len(paths)}; added: {added}; queue: {queue.status()}")
+
+
+def main_worker(dirname, db, parser_options):
+    # Resolve parser
+    external_parser = parser_options.get('external_parser')
+    variant = parser_options.get('variant', 1)
+
+    module_name = external_parser or f".index_{variant:03}"
+    parser = import_module(module_name, __package__)
+    if db.debug:
+        log.info(f"=== Parser: {parser.__file__} ===")
+
+    # Reg task, the same one as the coordinator's
+    saved, t_id = db.reg_task(parser, parser_options)
+    db.push_connection_record()
+
+    queue = WorkQueue(db, parser_options.get('queue_cname', '_queue'),
+        lease = int(parser_options.get('lease', 60)),                 # seconds
+        max_attempts = int(parser_options.get('max_attempts', 3))
+    )
+    if not queue.status():
+        log.warning(f"No queue for the task: {t_id}, run the coordinator first")
+        return
+
+    # A file claimed again after an expired lease continues from its checkpoint
+    db.resume = True
+
+    done = 0
+    with Timer(f"[ main_worker({queue.worker}) ] finished", db.verbose) as t, \
+         span("main_worker", dirname=dirname, worker=queue.worker):
+        for item in queue.claims():
+            filename = os.path.join(dirname, item['path'])
+            if db.verbose:
+                log.info(f"Claimed: {filename} (attempt {item['attempts']})")
+
+            with queue.leased(item) as lease:
+                db.lease = lease
+                try:
+                    ok = main_file(filename, db, parser, parser_options)
+
+                except LeaseLost as ex:
+                    log.warning(f"{ex}, the file is abandoned")
+                    continue
+
+                except Exception as ex:
+                    queue.finish(item, 'failed', error=str(ex))
+                    raise
+
+                finally:
+                    db.lease = None
+
+            queue.finish(item, 'completed' if ok else 'failed')
+            done += 1
 
-                main_file(filename, db, parser, parser_options)
+    log.info(f"Worker {queue.worker}: {done} file(s); queue: {queue.status()}")
 
 
 def load_options(config_file):
@@ -290,5 +711,5 @@ def decode(code, value):
     elif code == 'INTLIST':
         return [ int(i.strip()) for i in value.split(',') ]
     else:
-        print("Unknown code:", code)
+        log.warning(f"Unknown code: {code}")
         return value
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""On-disk cache of parsed record batches (`cache_dir`, opt-in).
+
+Entries are keyed by the file name and content hash, the parser (name,
+`__build__`, `__rev__`) and the parser options which change the records,
+so runs with another collection, upsert keys or database replay the
+batches instead of parsing the file again. An entry is a gzipped stream
+of BSON documents, one per batch. The least recently used entries are
+removed when the cache exceeds `cache_size` MB; the cache directory is
+read once per run, later entries are counted as they are stored.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+import bson
+
+from .log import log
+from .tracer import span
+
+
+# Options of the target (where and how records are written), not of parsing
+SINK_OPTIONS = {
+    'cname', 'upsert_mode', 'upsert_keys', 'record_keys', 'file_keys',
+    'indexes', 'search_index', 'search_cname', 'search_fields',
+    'dedup', 'resume', 'memory_limit', 'raise_after_exception',
+    'proceed_anyway', 'extra_history', 'extra_collapse', 'history_size',
+    'queue_cname', 'lease', 'max_attempts', 'spool_size',
+    'parallel', 'parallel_range',
+    'cache_dir', 'cache_size',
+    'compressors', 'zlib_level', 'max_pool_size', 'min_pool_size',
+    'connect_timeout', 'socket_timeout', 'server_timeout', 'write_profile',
+}
+
+SUFFIX = '.bson.gz'
+
+# Caches of the run by directory
+caches = {}
+
+
+def get_cache(dirname, max_size=1024):
+    """Cache of the directory shared by the files of the run."""
+    cache = caches.get(dirname)
+    if cache is None:
+        cache = caches[dirname] = ParseCache(dirname, max_size)
+
+    return cache
+
+
+class ParseCache(object):
+    def __init__(self, dirname, max_size=1024):
+        self.dirname = os.path.expanduser(dirname)
+        self.max_size = int(max_size * (1 << 20))     # MB
+
+        self.entries = None     # path -> size, least recently used first
+        self.total = 0
+
+        os.makedirs(self.dirname, exist_ok=True)
+
+    def get_key(self, file_hash, name, parser, options={}):
+        """Cache key of a file parsed with `parser` and `options`. The name
+        is a part of the key, parsers may take values from it.
+        """
+        doc = dict(
+            hash = file_hash,
+            name = name,
+            parser = parser.__name__,
+            build = getattr(parser, '__build__', 0),
+            rev = getattr(parser, '__rev__', 0),
+            options = {k: v for k, v in options.items() if k not in SINK_OPTIONS}
+        )
+        data = json.dumps(doc, sort_keys=True, default=str)
+
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.dirname, key[:2], key + SUFFIX)
+
+    def get(self, key):
+        """Path of the entry or None, a hit makes the entry recently used."""
+        path = self.get_path(key)
+        try:
+            os.utime(path)
+
+        except FileNotFoundError:
+            return None
+
+        self.use(path)
+        return path
+
+    def replay(self, path):
+        """Yield batches of the entry as the parser did."""
+        with span("cache_replay"), gzip.open(path, 'rb') as f:
+            for doc in bson.decode_file_iter(f):
+                if 'e' in doc:
+                    yield doc['r'], doc['e']
+                else:
+                    yield doc['r']
+
+    def store(self, key, chunks):
+        """Pass batches of the parser through and save them as an entry,
+        which appears only when the parser is exhausted.
+        """
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, temp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                for records in chunks:
+                    # Encoded before the records get `_id` and keys of the target
+                    if isinstance(records, tuple):
+                        f.write(bson.encode(dict(r=records[0], e=records[1])))
+                    else:
+                        f.write(bson.encode(dict(r=records)))
+
+                    yield records
+
+            os.replace(temp, path)
+
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+        self.use(path, replaced=True)
+        self.evict()
+
+    def load(self):
+        """Entries of the cache directory by the time of use."""
+        found = []
+        for root, dirs, files in os.walk(self.dirname):
+            for name in files:
+                if name.endswith(SUFFIX):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, stat.st_size, path))
+
+        self.entries = OrderedDict((path, size) for mtime, size, path in sorted(found))
+        self.total = sum(self.entries.values())
+
+    def use(self, path, replaced=False):
+        """Make the entry the most recently used."""
+        if self.entries is None:
+            self.load()
+
+        size = self.entries.pop(path, None)
+        if size is None or replaced:
+            self.total -= size or 0
+            size = os.path.getsize(path)
+            self.total += size
+
+        self.entries[path] = size
+
+    def evict(self):
+        """Remove least recently used entries above `max_size`."""
+        while self.total > self.max_size and self.entries:
+            path, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(path)
+                log.debug(f"Cache entry removed: {path}")
+
+            except FileNotFoundError:   # removed by another run
+                pass
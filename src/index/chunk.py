@@ -8,3 +8,14 @@ from itertools import islice
 def chunk(it, size):
     it = iter(it)
     return iter(lambda: tuple(islice(it, size)), ())
+
+
+def chunk_adaptive(it, get_size):
+    """Like `chunk`, but the size is requested before every chunk."""
+    it = iter(it)
+    while True:
+        res = tuple(islice(it, get_size()))
+        if not res:
+            return
+
+        yield res
@@ -3,17 +3,29 @@
 # Stan 2021-05-31
 
 import argparse
+import json
 import platform
+import sys
 
 from . import main as run
 
 
 def main():
+    if sys.argv[1:2] == ['search']:
+        return search_main(sys.argv[2:])
+
+    if sys.argv[1:2] == ['migrate']:
+        return migrate_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(description="Index a spreadsheet")
 
     parser.add_argument('filename',
                         nargs='?',
-                        help="specify a path (dir/file)",
+                        help="specify a path (dir/file), '-' reads a file from stdin",
+                        metavar="file.xlsx")
+
+    parser.add_argument('--name',
+                        help="name of the file read from stdin, its extension selects the format",
                         metavar="file.xlsx")
 
     parser.add_argument('--dburi',
@@ -28,10 +40,84 @@ def main():
                         help="specify a collection name (default is 'dump')",
                         metavar="name")
 
+    parser.add_argument('--compressors',
+                        help="wire compression: comma-separated list of zstd, snappy, zlib (env: INDEX_COMPRESSORS)",
+                        metavar="zstd,zlib")
+
+    parser.add_argument('--max-pool-size',
+                        type=int,
+                        help="maximum number of connections in the pool (env: INDEX_MAX_POOL_SIZE)",
+                        metavar="N")
+
+    parser.add_argument('--server-timeout',
+                        type=int,
+                        help="server selection timeout, ms (env: INDEX_SERVER_TIMEOUT)",
+                        metavar="ms")
+
+    parser.add_argument('--socket-timeout',
+                        type=int,
+                        help="socket timeout, ms (env: INDEX_SOCKET_TIMEOUT)",
+                        metavar="ms")
+
+    parser.add_argument('--write-profile',
+                        choices=['fast', 'safe'],
+                        help="write concern for records: 'fast' (w=1, no journal) or 'safe'; metadata is always written 'safe' (env: INDEX_WRITE_PROFILE)")
+
     parser.add_argument('--config',
                         help="specify a config file (default is 'parser.cfg' located in the target directory)",
                         metavar="parser.cfg")
 
+    parser.add_argument('--rebuild',
+                        action='store_true',
+                        help="load into a shadow collection, build indexes and swap it with the target")
+
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help="skip completed files and continue interrupted ones from the last checkpoint")
+
+    parser.add_argument('--dedup',
+                        action='store_true',
+                        help="hash file contents and link copies to the records of the first parsed one")
+
+    parser.add_argument('--cache-dir',
+                        help="keep parsed records in a local cache and replay them for unchanged files (option 'cache_size' in MB, default is 1024)",
+                        metavar="dir")
+
+    parser.add_argument('--coordinator',
+                        action='store_true',
+                        help="enqueue files of the directory for workers")
+
+    parser.add_argument('--worker',
+                        action='store_true',
+                        help="claim and process queued files of the directory (any number of hosts)")
+
+    parser.add_argument('--preview',
+                        type=int,
+                        help="read only the first N rows of every sheet and report sheet names, dimensions and samples (into '_preview')",
+                        metavar="N")
+
+    parser.add_argument('--preview-report',
+                        help="write the preview report as JSON lines into a file instead ('-' for stdout)",
+                        metavar="report.jsonl")
+
+    parser.add_argument('--history-size',
+                        type=int,
+                        help="number of latest records kept on a file/task, the full history is in '_runs' (default is 10)",
+                        metavar="N")
+
+    parser.add_argument('--trace',
+                        help="save a timeline of the run in Chrome Trace Event format",
+                        metavar="trace.json")
+
+    parser.add_argument('--log-level',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        type=str.upper,
+                        help="logging level (default is INFO, DEBUG in debug mode)")
+
+    parser.add_argument('--log-json',
+                        action='store_true',
+                        help="write log records as JSON lines")
+
     parser.add_argument('--version',
                         action='store_true',
                         help="version")
@@ -66,3 +152,102 @@ def main():
 
     params = {k: v for k, v in vars(args).items() if v}
     run(**params)
+
+
+def search_main(argv=None):
+    parser = argparse.ArgumentParser(prog="index search",
+                                     description="Find files and sheets containing a value")
+
+    parser.add_argument('value',
+                        help="value to look for (case-insensitive for strings, exact with --scan)")
+
+    parser.add_argument('--dburi',
+                        help="specify a database connection (default is 'mongodb://localhost')",
+                        metavar="dbtype://username@hostname/[dbname]")
+
+    parser.add_argument('--dbname',
+                        help="specify a database name (default is 'db1')",
+                        metavar="name")
+
+    parser.add_argument('--cname',
+                        help="specify a collection name (default is 'dump')",
+                        metavar="name")
+
+    parser.add_argument('--search-cname',
+                        help="specify the value index collection (default is '_values')",
+                        metavar="name")
+
+    parser.add_argument('--prefix',
+                        action='store_true',
+                        help="match values starting with the given string")
+
+    parser.add_argument('--scan',
+                        action='store_true',
+                        help="scan the collection itself for exact, case-sensitive values (data indexed without `search_index`)")
+
+    parser.add_argument('--limit',
+                        type=int,
+                        default=100,
+                        help="maximum number of sheets to report (default is 100)",
+                        metavar="N")
+
+    parser.add_argument('--json',
+                        action='store_true',
+                        help="print results as JSON")
+
+    args = parser.parse_args(argv)
+
+    from .search import search, get_path
+
+    params = {k: v for k, v in vars(args).items() if v and k not in ('json',)}
+    results = search(**params)
+
+    if args.json:
+        print(json.dumps(results, default=str, ensure_ascii=False, indent=2))
+        return
+
+    for res in results:
+        name = get_path(res)
+
+        rows = ', '.join(str(r) for r in res['rows'][:10])
+        if len(res['rows']) > 10:
+            rows += f" (+{len(res['rows']) - 10} more)"
+
+        print(f"{name}  sheet {res['_shid']}: rows {rows}")
+        for copy in res['copies']:
+            print(f"  same content: {copy}")
+
+    if not results:
+        print("Not found")
+
+
+def migrate_main(argv=None):
+    parser = argparse.ArgumentParser(prog="index migrate",
+                                     description="Move the history of files and tasks into the run log")
+
+    parser.add_argument('--dburi',
+                        help="specify a database connection (default is 'mongodb://localhost')",
+                        metavar="dbtype://username@hostname/[dbname]")
+
+    parser.add_argument('--dbname',
+                        help="specify a database name (default is 'db1')",
+                        metavar="name")
+
+    parser.add_argument('--history-size',
+                        type=int,
+                        help="number of latest records kept on a file/task (default is 10)",
+                        metavar="N")
+
+    parser.add_argument('-v', '--verbose',
+                        action='store_true',
+                        help="verbose mode")
+
+    args = parser.parse_args(argv)
+
+    from .db import Db
+
+    params = {k: v for k, v in vars(args).items() if v}
+    db = Db(**params)
+
+    moved = db.migrate_history()
+    print(f"Records moved: {moved}")
@@ -4,9 +4,16 @@
 
 from datetime import datetime
 
+import os
+
 import pymongo
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.write_concern import WriteConcern
 
+from ..log import log, fields
 from ..timer import Timer
+from ..tracer import span
 from ..utils import get_file_info
 
 
@@ -17,7 +24,14 @@ class Db():
         cname       = 'dump',
         cname_files = '_files',
         cname_tasks = '_tasks',
+        cname_runs  = '_runs',
+        history_size = 10,
         tls_ca_file = None,
+        rebuild     = False,
+        resume      = False,
+        dedup       = False,
+        cache_dir   = None,
+        write_profile = None,
         verbose     = False,
         debug       = False,
         ** kargs
@@ -27,24 +41,62 @@ class Db():
         self.cname       = cname
         self.cname_files = cname_files
         self.cname_tasks = cname_tasks
+        self.cname_runs  = cname_runs
+        self.history_size = history_size    # latest records kept on a file/task
+        self.rebuild     = rebuild
+        self.resume      = resume
+        self.dedup       = dedup
+        self.cache_dir   = cache_dir
+        self.write_profile = write_profile
         self.verbose     = verbose
         self.debug       = debug
 
         self.current_file = None
         self.current_task = None
 
+        self.memory_budget = None       # Set per file by `main_file`
+        self.progress = None            # Set by `main_dir`
+        self.lease = None               # Lease of the claimed file, set by `main_worker`
+
+        self.shadows = {}               # cname -> shadow cname (rebuild mode)
+
+        self.checkpoint = None          # Resume position of the current file
+
+        self.generation = None          # Scan generation of the current file (upsert mode)
+
+        self.extra_history = None       # Scans kept in `_extra` of a row (upsert mode)
+        self.extra_collapse = False     # Unchanged scans of a row update `last_seen`
+
+        self.sheets = None              # Sheet info reported by readers (preview mode)
+        self.messages = None            # File records of readers (preview mode)
+
+        self.hash_indexed = False
+        self.runs_indexed = False
+        self.gen_indexed = set()        # collections with the `_gen` index
+
+        self.client_options = get_client_options(kargs)
         self.client = pymongo.MongoClient(
             dburi,
             tlsCAFile = tls_ca_file,
-#           serverSelectionTimeoutMS = 10000
+            ** self.client_options
         )
 
+        # Write concerns for data and metadata collections
+        self.data_concern = None
+        meta_concern = None
+        if write_profile:
+            if write_profile not in WRITE_PROFILES:
+                raise ValueError(f"Unknown write profile: '{write_profile}'")
+
+            self.data_concern = WriteConcern(**WRITE_PROFILES[write_profile])
+            meta_concern = WriteConcern(**WRITE_PROFILES['safe'])
+
         if not dbname:
-            self.db = self.client.get_default_database('db1')
+            self.db = self.client.get_default_database('db1', write_concern=meta_concern)
             dbname = self.db.name
 
         else:
-            self.db = self.client[dbname]
+            self.db = self.client.get_database(dbname, write_concern=meta_concern)
 
         self.dbname = dbname
 
@@ -65,6 +117,73 @@ class Db():
         return self.db[cname]
 
 
+    def data(self, cname):
+        """Data collection with the write concern of the profile."""
+        collection = self.db[cname]
+        if self.data_concern:
+            collection = collection.with_options(write_concern=self.data_concern)
+
+        return collection
+
+
+    def target(self, cname):
+        """Collection to write records to.
+        In rebuild mode it is a shadow collection without secondary indexes,
+        which replaces the target collection in `finish_rebuild`.
+        """
+        if not self.rebuild:
+            return self.data(cname)
+
+        shadow = self.shadows.get(cname)
+        if not shadow:
+            shadow = f"_rebuild_{cname}"
+            self.db.drop_collection(shadow)     # Leftover of an interrupted rebuild
+            self.shadows[cname] = shadow
+
+        return self.data(shadow)
+
+
+    def finish_rebuild(self, indexes=None):
+        """Build indexes on shadow collections and swap them with the targets."""
+        for cname, shadow in self.shadows.items():
+            collection = self.db[shadow]
+
+            specs = []
+            if cname in self.db.list_collection_names():
+                for name, info in self.db[cname].index_information().items():
+                    if name != '_id_':
+                        options = {k: v for k, v in info.items() if k not in INDEX_INFO_KEYS}
+                        specs.append((get_info_keys(info), dict(options, name=name)))
+
+            for index in indexes or []:
+                if isinstance(index, dict):
+                    index = dict(index)
+                    keys = index.pop('keys')
+                    specs.append((get_index_keys(keys), index))
+
+                else:
+                    specs.append((get_index_keys(index), {}))
+
+            with Timer(f"[ rebuild ] indexes for '{cname}'", self.verbose) as t:
+                for keys, options in specs:
+                    collection.create_index(keys, **options)
+
+            # Atomic `renameCollection` over the target
+            collection.rename(cname, dropTarget=True)
+
+            if self.verbose:
+                log.info(f"Collection '{cname}' rebuilt: {len(specs)} index(es)")
+
+        self.shadows = {}
+
+
+    def discard_rebuild(self):
+        for shadow in self.shadows.values():
+            self.db.drop_collection(shadow)
+
+        self.shadows = {}
+
+
     def insert_many(self, collection, record_list, **kargs):
         now = datetime.utcnow()
 
@@ -72,10 +191,11 @@ class Db():
         record_list = [ dict(record, **extra) for record in record_list ]
 
         if self.debug:
-            print(f"[ {now} ]: inserting started ({ len(record_list) } records)...", end=" ")
+            log.debug(f"[ {now} ]: inserting started ({ len(record_list) } records)...")
 
-        with Timer("completed", self.verbose) as t:
-            res = collection.insert_many(record_list)
+        with Timer(f"[ insert_many ] {len(record_list)} records", self.verbose) as t, \
+             span("insert_many", records=len(record_list)):
+            res = collection.insert_many(record_list, ordered=not self.rebuild)
 
         return res
 
@@ -86,98 +206,81 @@ class Db():
         if not upsert_keys:
             upsert_keys = record_list[0].keys()
 
+        # Rows seen by the scan, deleted ones are found after it by generation
+        key = self.scan_key()
+
         upserts = [ pymongo.UpdateOne(
             filter = {k: v for k, v in x.items() if k in upsert_keys},
-            update = {
-                "$currentDate": {
-                  "updated": True,
-                },
-                "$push": {
-                    "_extra": {
-                        "_tid": self.current_task,
-                        "_fid": self.current_file,
-                        ** {k: v for k, v in x.items() if not k in upsert_keys},
-                        ** kargs,
-                        "scanned": now,
-                    },
-                },
-                "$inc": { "_v": 1 },
-                "$setOnInsert": {
-                    "created": now,
-                },
-            },
+            update = self.get_upsert_update(dict(
+                _tid = self.current_task,
+                _fid = self.current_file,
+                ** {k: v for k, v in x.items() if not k in upsert_keys},
+                ** kargs,
+                scanned = now
+            ), key, now),
             upsert = True
         ) for x in record_list ]
 
         if self.debug:
-            print(f"[ {now} ]: upserting started ({ len(record_list) } records)...", end=" ")
+            log.debug(f"[ {now} ]: upserting started ({ len(record_list) } records)...")
 
-        with Timer("completed", self.verbose) as t:
+        with Timer(f"[ upsert_many ] {len(record_list)} records", self.verbose) as t, \
+             span("upsert_many", records=len(record_list)):
             res = collection.bulk_write(upserts)
 
         if self.debug:
-            print("deleted: %s / inserted: %s / matched: %s / modified: %s / upserted: %s" % (
+            log.debug("deleted: %s / inserted: %s / matched: %s / modified: %s / upserted: %s",
                 res.deleted_count,
                 res.inserted_count,
                 res.matched_count,
                 res.modified_count,
-                res.upserted_count)
+                res.upserted_count,
+                extra = fields(
+                    deleted = res.deleted_count,
+                    inserted = res.inserted_count,
+                    matched = res.matched_count,
+                    modified = res.modified_count,
+                    upserted = res.upserted_count
+                )
             )
 
-        # Remove the `deleted` flag for existing records
-        # Feature: `deleted` flag will be relative to the last scan
-        updates = [ pymongo.UpdateOne(
-            filter = {
-                ** {k: v for k, v in x.items() if k in upsert_keys},
-                "_extra": {
-                    "$elemMatch": {
-                        "_tid": self.current_task,
-                        "_fid": self.current_file,
-                        "deleted": True,
-                    }
-                },
-            },
-            update = {
-                "$unset": { "_extra.$[elem].deleted": "" },
-            },
-            array_filters = [
-                {
-                    "elem._tid": self.current_task,
-                    "elem._fid": self.current_file,
-                    ** {f"elem.{k}": v for k, v in x.items() if not k in upsert_keys},
-                }
-            ]
-        ) for x in record_list ]
-  
-        collection.bulk_write(updates)
-
         return res
 
 
+    def get_upsert_update(self, entry, key, now):
+        """Update of a row seen by the scan, `entry` is the `_extra` element."""
+        return get_upsert_pipeline(entry, key, self.generation, now,
+                                   self.extra_history, self.extra_collapse)
+
+
     def upsert_pre_handle(self, collection):
-        collection.update_many(
-            filter = {
-                "_extra": {
-                    "$elemMatch": {
-                        "_tid": self.current_task,
-                        "_fid": self.current_file,
-                    }
-                },
-            },
-            update = {
-                "$set": { "_extra.$[elem].deleted": True },
-            },
-            array_filters = [
-                {
-                    "elem._tid": self.current_task,
-                    "elem._fid": self.current_file,
-                }
-            ]
-        )
+        """Start a scan of the current file, returns its generation."""
+        self.generation = self.next_generation()
+        return self.generation
 
 
     def upsert_post_handle(self, collection):
-        pass
+        """Mark rows of the current file missing from the finished scan
+        (seen by an earlier generation only) as deleted.
+        """
+        key = self.scan_key()
+
+        if collection.name not in self.gen_indexed:
+            collection.create_index([("_gen.k", 1), ("_gen.g", 1)])
+            self.gen_indexed.add(collection.name)
+
+        with span("upsert_post_handle"):
+            res = collection.update_many(
+                filter = {
+                    "_gen": { "$elemMatch": { "k": key, "g": { "$lt": self.generation } } },
+                    "_deleted.k": { "$ne": key },
+                },
+                update = {
+                    "$push": { "_deleted": { "k": key, "t": datetime.utcnow() } },
+                }
+            )
+
+        return res.modified_count
 
 
     # Methods for _tasks collection
@@ -218,12 +321,27 @@ class Db():
         return False, res.inserted_id
 
 
+    def push_connection_record(self):
+        """Record the applied client options and write profile."""
+        return self.push_task_record('connection',
+            client_options = self.client_options,
+            write_profile = self.write_profile,
+            data_concern = self.data_concern.document if self.data_concern else None
+        )
+
+
     def push_task_record(self, action, **kargs):
         now = datetime.utcnow()
 
         collection = self.db[self.cname_tasks]
 
         amended = {k: v for k, v in kargs.items() if not is_empty(v)}
+        record = dict(
+            action = action,
+            ** amended,
+            created = now
+        )
+        run_id = self.push_run(dict(record, _tid=self.current_task))
 
         return collection.update_one(
             filter = { "_id": self.current_task },
@@ -232,16 +350,25 @@ class Db():
                     "updated": now,
                 },
                 "$push": {
-                    "records": dict(
-                        action = action,
-                        ** amended,
-                        created = now
-                    )
+                    "records": {
+                        "$each": [ get_summary(record, run_id) ],
+                        "$slice": -self.history_size,
+                    }
                 },
             }
         )
 
 
+    def set_task_progress(self, progress):
+        """Snapshot of the run progress for dashboards."""
+        collection = self.db[self.cname_tasks]
+
+        return collection.update_one(
+            filter = { "_id": self.current_task },
+            update = { "$set": { "progress": progress } }
+        )
+
+
     # Methods for _files collection
 
     def reg_file(self, filename, **kargs):
@@ -281,8 +408,14 @@ class Db():
         res = collection.find_one(
             {
                 "_id": self.current_file,
-                "records._tid": self.current_task,
-                "records.action": "completed",
+                "$or": [
+                    { f"status.{self.current_task}.action": { "$in": ["completed", "duplicate"] } },
+                    # Not migrated history
+                    { "records": { "$elemMatch": {
+                        "_tid": self.current_task,
+                        "action": { "$in": ["completed", "duplicate"] },
+                    } } },
+                ],
             },
             { "_id": 1 }
         )
@@ -300,26 +433,442 @@ class Db():
 
         amended = {k: v for k, v in kargs.items() if not is_empty(v)}
 
+        # Preview mode, nothing is registered
+        if self.messages is not None:
+            self.messages.append(dict(action=action, ** amended))
+            return None
+
+        record = dict(
+            action = action,
+            _tid = self.current_task,
+            ** amended,
+            created = now
+        )
+        run_id = self.push_run(dict(record, _fid=self.current_file))
+        summary = get_summary(record, run_id)
+
+        update = { "updated": now }
+        if action in STATUS_ACTIONS:
+            update[f"status.{self.current_task}"] = summary
+
         return collection.update_one(
             filter = { "_id": self.current_file },
             update = {
-                "$set": {
-                    "updated": now,
-                },
+                "$set": update,
                 "$push": {
-                    "records": dict(
-                        action = action,
+                    "records": {
+                        "$each": [ summary ],
+                        "$slice": -self.history_size,
+                    }
+                },
+            }
+        )
+
+
+    def push_sheet_info(self, shid, name, **kargs):
+        """Names and dimensions of sheets, collected in preview mode only."""
+        if self.sheets is not None:
+            amended = {k: v for k, v in kargs.items() if not is_empty(v)}
+            self.sheets.append(dict(_shid=shid, name=name, ** amended))
+
+
+    def scan_key(self):
+        """Key (`k`) of the current task and file in `_gen`/`_deleted` of rows."""
+        return f"{self.current_task}_{self.current_file}"
+
+
+    def next_generation(self):
+        """Number of the next scan of the current file by the current task."""
+        collection = self.db[self.cname_files]
+
+        res = collection.find_one_and_update(
+            filter = { "_id": self.current_file },
+            update = { "$inc": { f"generations.{self.current_task}": 1 } },
+            projection = { "generations": 1 },
+            return_document = ReturnDocument.AFTER
+        )
+
+        return res['generations'][str(self.current_task)]
+
+
+    # Content dedup (in _files collection)
+
+    def set_file_hash(self, file_hash):
+        collection = self.db[self.cname_files]
+
+        if not self.hash_indexed:
+            collection.create_index([("hash", 1)])
+            self.hash_indexed = True
+
+        return collection.update_one(
+            filter = { "_id": self.current_file },
+            update = { "$set": { "hash": file_hash } }
+        )
+
+
+    def find_duplicate(self, file_hash):
+        """Another file with the same content completed by the current task."""
+        collection = self.db[self.cname_files]
+
+        res = collection.find_one(
+            {
+                "_id": { "$ne": self.current_file },
+                "hash": file_hash,
+                "$or": [
+                    { f"status.{self.current_task}.action": "completed" },
+                    # Not migrated history
+                    { "records": { "$elemMatch": {
+                        "_tid": self.current_task,
+                        "action": "completed",
+                    } } },
+                ],
+            },
+            { "_id": 1, "name": 1 }
+        )
+
+        return res
+
+
+    def link_duplicate(self, original):
+        """Point the current file to the records of `original`."""
+        collection = self.db[self.cname_files]
+
+        collection.update_one(
+            filter = { "_id": self.current_file },
+            update = { "$set": { "same_as": original['_id'] } }
+        )
+
+        return self.push_file_record('duplicate',
+            same_as = original['_id'],
+            name = original.get('name')
+        )
+
+
+    # Run history (_runs collection)
+
+    def push_run(self, record):
+        """Append a file (`_fid`) or task record to the run log."""
+        collection = self.db[self.cname_runs]
+
+        if not self.runs_indexed:
+            collection.create_index([("_fid", 1), ("_tid", 1)])
+            collection.create_index([("_tid", 1), ("created", 1)])
+            self.runs_indexed = True
+
+        return collection.insert_one(record).inserted_id
+
+
+    def find_schema(self, shid):
+        """The last `schema` record of a sheet of the current file (header_mode)."""
+        collection = self.db[self.cname_runs]
+
+        return collection.find_one(
+            {
+                "_fid": self.current_file,
+                "_tid": self.current_task,
+                "action": "schema",
+                "shid": shid,
+            },
+            sort = [("created", -1)]
+        )
+
+
+    def migrate_history(self):
+        """Move `records` of files and tasks written before the run log into
+        it, keeping the latest summaries. Returns the number of moved records.
+        """
+        moved = 0
+
+        for cname, key in ((self.cname_files, '_fid'), (self.cname_tasks, '_tid')):
+            collection = self.db[cname]
+
+            for doc in collection.find(
+                { "records": { "$elemMatch": { "_run": { "$exists": False } } } },
+                { "records": 1, "status": 1 }
+            ):
+                old = [ r for r in doc['records'] if '_run' not in r ]
+
+                # Moved records are tagged with the collection, a migration
+                # interrupted before the summaries were saved is repeated
+                # from the start (records of files keep their `_tid`)
+                runs = self.db[self.cname_runs]
+                runs.delete_many({ key: doc['_id'], "_migrated": cname })
+                res = runs.insert_many(
+                    [ dict(r, ** {key: doc['_id']}, _migrated=cname) for r in old ]
+                )
+                moved += len(old)
+
+                summaries = [ get_summary(r, run_id) for r, run_id in zip(old, res.inserted_ids) ]
+                summaries += [ r for r in doc['records'] if '_run' in r ]
+                summaries.sort(key=get_created)
+
+                update = { "records": summaries[-self.history_size:] }
+
+                if key == '_fid':
+                    status = doc.get('status', {})
+                    for r in summaries:
+                        if r['action'] in STATUS_ACTIONS and r.get('_tid'):
+                            last = status.get(str(r['_tid']))
+                            if not last or get_created(r) >= get_created(last):
+                                status[str(r['_tid'])] = r
+
+                    update['status'] = status
+
+                collection.update_one(
+                    filter = { "_id": doc['_id'] },
+                    update = { "$set": update }
+                )
+
+                if self.verbose:
+                    log.info(f"[ {cname} ] {doc['_id']}: {len(old)} records moved")
+
+        return moved
+
+
+    # Checkpoints (in _files collection)
+
+    def get_checkpoint(self):
+        """Last committed position of the current file for the current task."""
+        collection = self.db[self.cname_files]
+
+        res = collection.find_one({ "_id": self.current_file }, { "checkpoint": 1 })
+        checkpoint = res and res.get('checkpoint')
+        if checkpoint and checkpoint.get('_tid') == self.current_task:
+            return checkpoint
+
+
+    def set_checkpoint(self, **checkpoint):
+        now = datetime.utcnow()
+
+        collection = self.db[self.cname_files]
+
+        return collection.update_one(
+            filter = { "_id": self.current_file },
+            update = {
+                "$set": {
+                    "checkpoint": dict(
                         _tid = self.current_task,
-                        ** amended,
-                        created = now
+                        ** checkpoint,
+                        updated = now
                     )
                 },
             }
         )
 
 
+    def clear_checkpoint(self):
+        collection = self.db[self.cname_files]
+
+        return collection.update_one(
+            filter = { "_id": self.current_file },
+            update = { "$unset": { "checkpoint": "" } }
+        )
+
+
+    def committed_rows(self, shid):
+        """Number of rows of a sheet to skip when resuming,
+        None if the whole sheet is already committed.
+        """
+        checkpoint = self.checkpoint
+        if not checkpoint or shid not in checkpoint['shids']:
+            return 0
+
+        if shid != checkpoint['_shid']:
+            return None
+
+        return checkpoint['_r']
+
+
+    def is_committed(self, record):
+        committed = self.committed_rows(record.get('_shid'))
+        return committed is None or record.get('_r', 0) <= committed
+
+
+    def delete_uncommitted(self, collection, **kargs):
+        """Remove documents of the current file (records, search values)
+        written by the interrupted run after its checkpoint.
+        """
+        checkpoint = self.checkpoint
+        done = [shid for shid in checkpoint['shids'] if shid != checkpoint['_shid']]
+
+        committed = [{ "_shid": { "$in": done } }]
+        if checkpoint['_shid'] is not None:
+            committed.append({
+                "_shid": checkpoint['_shid'],
+                "_r": { "$lte": checkpoint['_r'] }
+            })
+
+        return collection.delete_many({
+            "_fid": self.current_file,
+            "_id": { "$gte": ObjectId.from_datetime(checkpoint['started']) },
+            "$nor": committed,
+            ** kargs
+        })
+
+
 # Utilities
 
+# Write concern for data collections, metadata is always written `safe`
+WRITE_PROFILES = {
+    'fast': dict(w=1, j=False),             # bulk loads
+    'safe': dict(w='majority', j=True),
+}
+
+# Last record of these actions is the status of a file for a task
+STATUS_ACTIONS = ('completed', 'skipped', 'duplicate', 'exception')
+
+# Option (parser.cfg, CLI, INDEX_<OPTION> env) -> MongoClient keyword, type
+CLIENT_OPTIONS = {
+    'compressors':     ('compressors',              str),   # zstd,snappy,zlib
+    'zlib_level':      ('zlibCompressionLevel',     int),
+    'max_pool_size':   ('maxPoolSize',              int),
+    'min_pool_size':   ('minPoolSize',              int),
+    'connect_timeout': ('connectTimeoutMS',         int),
+    'socket_timeout':  ('socketTimeoutMS',          int),
+    'server_timeout':  ('serverSelectionTimeoutMS', int),
+}
+
+CONNECTION_OPTIONS = list(CLIENT_OPTIONS) + ['write_profile']
+
+
+def resolve_connection_options(kargs, parser_options={}):
+    """Connection options by priority: arguments, environment, parser.cfg."""
+    options = {}
+    for key in CONNECTION_OPTIONS:
+        value = kargs.get(key)
+        if value is None:
+            value = os.getenv(f"INDEX_{key.upper()}")
+        if value is None:
+            value = parser_options.get(key)
+
+        if value is not None:
+            options[key] = value
+
+    return options
+
+
+def get_client_options(options):
+    client_options = {}
+    for key, (name, cast) in CLIENT_OPTIONS.items():
+        value = options.get(key)
+        if value is not None:
+            client_options[name] = cast(value)
+
+    return client_options
+
+
+# Fields of `index_information()` which are not options of `create_index`
+INDEX_INFO_KEYS = ('v', 'ns', 'key')
+
+
+def get_summary(record, run_id):
+    """Record without bulky `__` fields, pointing to the full one."""
+    return dict(
+        {k: v for k, v in record.items() if not k.startswith('__')},
+        _run = run_id
+    )
+
+
+def get_upsert_pipeline(entry, key, generation, now, size=None, collapse=False):
+    """Update pipeline (MongoDB 4.2+) of a row seen by a scan. The `_gen`
+    element of the scan key `{k, g}` is replaced and its `_deleted` element
+    `{k, t}` removed, so the `_gen.k`/`_gen.g` index finds rows of earlier
+    scans. `entry` is appended to `_extra` (last `size` kept); with
+    `collapse` an unchanged last element only gets `last_seen`. Values are
+    `$literal`, so strings starting with `$` are not taken for field paths.
+    """
+    appended = { "$concatArrays": [ "$$extra", [ { "$literal": entry } ] ] }
+    if size:
+        appended = { "$slice": [ appended, -size ] }
+
+    extra = appended
+    if collapse:
+        same = {k: v for k, v in entry.items() if k != 'scanned'}
+
+        unchanged = { "$and": [
+            { "$eq": [ f"$$last.{k}", { "$literal": v } ] } for k, v in same.items()
+        ] + [
+            # No other keys than `scanned` and `last_seen`
+            { "$in": [ { "$size": { "$objectToArray": "$$last" } },
+                       [ len(same) + 1, len(same) + 2 ] ] },
+        ] }
+
+        seen = dict(
+            { k: { "$literal": v } for k, v in same.items() },
+            scanned = "$$last.scanned",
+            last_seen = now
+        )
+
+        extra = { "$let": {
+            "vars": { "last": { "$ifNull": [
+                { "$arrayElemAt": [ "$$extra", -1 ] }, {}
+            ] } },
+            "in": { "$cond": [
+                unchanged,
+                # The last element replaced
+                { "$concatArrays": [
+                    { "$slice": [ "$$extra",
+                        { "$max": [ { "$subtract": [ { "$size": "$$extra" }, 1 ] }, 0 ] } ] },
+                    [ seen ],
+                ] },
+                appended,
+            ] },
+        } }
+
+    # Elements of other scan keys
+    others = lambda field: { "$filter": {
+        "input": { "$ifNull": [ field, [] ] },
+        "cond": { "$ne": [ "$$this.k", key ] },
+    } }
+
+    return [
+        { "$set": {
+            "updated": "$$NOW",
+            "_gen": { "$concatArrays": [
+                others("$_gen"), [ { "k": key, "g": generation } ]
+            ] },
+            "_deleted": { "$let": {
+                "vars": { "deleted": others("$_deleted") },
+                "in": { "$cond": [
+                    { "$eq": [ "$$deleted", [] ] }, "$$REMOVE", "$$deleted"
+                ] },
+            } },
+            "_extra": { "$let": {
+                "vars": { "extra": { "$ifNull": [ "$_extra", [] ] } },
+                "in": extra,
+            } },
+            "_v": { "$add": [ { "$ifNull": [ "$_v", 0 ] }, 1 ] },
+            "created": { "$ifNull": [ "$created", now ] },
+        } },
+    ]
+
+
+def get_created(record):
+    return record.get('created') or datetime.min
+
+
+def get_info_keys(info):
+    """Keys of `index_information()` for `create_index`: fields of a text
+    index are taken from `weights` instead of `_fts`/`_ftsx`.
+    """
+    keys = []
+    for field, direction in info['key']:
+        if field == '_fts':
+            keys.extend((k, 'text') for k in info.get('weights', {}))
+        elif field != '_ftsx':
+            keys.append((field, direction))
+
+    return keys
+
+
+def get_index_keys(keys):
+    """'field', ['field1', 'field2'], [['field', -1], ...] -> [(field, direction)]"""
+    if isinstance(keys, str):
+        keys = [keys]
+
+    return [tuple(k) if isinstance(k, (list, tuple)) else (k, 1) for k in keys]
+
+
 def is_empty(v):
     if v:
         return False
@@ -3,7 +3,7 @@
 # Stan 2022-02-05
 
 """Default parser for processing of spreadsheet files.
-Available file formats: xlsx, xlsm, xlsb, xls.
+Available file formats: xlsx, xlsm, xlsb, xls, ods, csv, tsv (also gzipped).
 """
 
 import os
@@ -17,12 +17,28 @@ __preferred_upsert_keys__ = ['_row', '_shid', '_r']
 
 
 def main(filename, db, options={}, **kargs):
+    """Yield records of `filename`; with `fileobj` (a seekable file object)
+    the content is read from it and `filename` gives the extension only.
+    """
     _, ext = os.path.splitext(filename)
     ext = ext.lower()
 
+    # Compressed text formats: file.csv.gz
+    if ext == '.gz':
+        _, ext = os.path.splitext(filename[:-3])
+        ext = ext.lower()
+        if ext not in ('.csv', '.tsv'):
+            return
+
     module = get_by_ext(ext)
     if module:
-        for res in module.main_yield(filename, db, options):
+        chunks = module.main_yield(filename, db, options, **kargs)
+
+        if int(options.get('header_mode') or 0):
+            header = import_module(".header", __package__ )
+            chunks = header.with_header(chunks, db, options)
+
+        for res in chunks:
             yield res
 
 
@@ -38,4 +54,10 @@ def get_by_ext(ext):
     elif ext == '.xlsx' or ext == '.xlsm':
         module = import_module(".format_xlsx", __package__ )
 
+    elif ext == '.ods':
+        module = import_module(".format_ods", __package__ )
+
+    elif ext == '.csv' or ext == '.tsv':
+        module = import_module(".format_csv", __package__ )
+
     return module
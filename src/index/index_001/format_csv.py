@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+import codecs
+import csv
+import gzip
+import io
+import os
+from itertools import count
+from itertools import islice
+
+from ..log import log
+from ..timer import Timer
+from ..tracer import span
+from .funcs import Projection
+from .funcs import pack_cells
+from .funcs import pack_row
+from .funcs import yield_records
+
+
+SAMPLE_SIZE = 64 * 1024
+
+# Large quoted cells (the default limit is 128 KB), C long on all platforms
+FIELD_SIZE_LIMIT = 2 ** 31 - 1
+
+BOMS = [
+    (codecs.BOM_UTF8,     'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def main_yield(filename, db, options={}, **kargs):
+    chunk_rows  = options.get('chunk_rows', 5000)
+    row_mode    = int(options.get('row_mode', 1))
+    cells_mode  = int(options.get('cells_mode', 0))
+    encoding    = options.get('encoding')
+    delimiter   = options.get('delimiter')
+    fallback_encoding = options.get('fallback_encoding', 'cp1251')
+    budget      = db.memory_budget
+    proj        = Projection(options)
+    fileobj     = kargs.get('fileobj')
+
+    with Timer(f"[ {__name__} ] sniff", db.verbose) as t, \
+         span("open_csv", module=__name__):
+        with open_binary(filename, fileobj) as f:
+            sample = f.read(SAMPLE_SIZE)
+
+        if not encoding:
+            encoding = sniff_encoding(sample, fallback_encoding)
+
+        if not delimiter:
+            delimiter = sniff_delimiter(sample, encoding, filename)
+
+    csv.field_size_limit(FIELD_SIZE_LIMIT)
+
+    shid = 1
+    shname = os.path.basename(filename)
+
+    if db.verbose:
+        log.info(f"Processing: # {shid} ({shname}) / encoding: {encoding}, delimiter: {delimiter!r}")
+
+    # Already committed by an interrupted run
+    committed = db.committed_rows(shid)
+    if committed is None:
+        return
+
+    db.push_sheet_info(shid, shname, encoding=encoding, delimiter=delimiter)
+
+    with open_binary(filename, fileobj) as f:
+        text = io.TextIOWrapper(f, encoding=encoding, errors='replace', newline='')
+        rows = csv.reader(text, delimiter=delimiter)
+        if proj.max_row is not None:
+            rows = islice(rows, proj.max_row)      # the rest is not read
+
+        yield from yield_records(rows, shid, shname, chunk_rows,
+            lambda row, idx: get_record(proj.pick(row), row_mode, cells_mode,
+                                        proj.cols()),
+            budget, skip=max(committed, proj.min_row - 1),
+            skip_empty=proj.skip_empty)
+
+
+def open_binary(filename, fileobj=None):
+    """A given `fileobj` is read from the start and left open."""
+    if fileobj:
+        fileobj.seek(0)
+        if filename.lower().endswith('.gz'):
+            return gzip.GzipFile(fileobj=fileobj, mode='rb')
+
+        return io.BufferedReader(Unclosed(fileobj))
+
+    if filename.lower().endswith('.gz'):
+        return gzip.open(filename, 'rb')
+
+    return open(filename, 'rb')
+
+
+class Unclosed(io.RawIOBase):
+    """Reader of a file object which is not closed with the reader."""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.fileobj.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def sniff_encoding(sample, fallback_encoding):
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    # The sample may end in the middle of a multibyte character
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        decoder.decode(sample, final=False)
+        return 'utf-8'
+
+    except UnicodeDecodeError:
+        return fallback_encoding
+
+
+def sniff_delimiter(sample, encoding, filename):
+    name = filename.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+
+    if name.endswith('.tsv'):
+        return '\t'
+
+    text = sample.decode(encoding, errors='ignore')
+    text = text[:text.rfind('\n') + 1] or text      # whole lines only
+    try:
+        return csv.Sniffer().sniff(text, delimiters=",;\t|").delimiter
+
+    except csv.Error:
+        return ','
+
+
+def get_record(row, row_mode, cells_mode, cols=None):
+    record = {}
+
+    if row_mode:
+        record['_row'] = pack_row(get_row_values(row), row_mode)
+
+    if cells_mode:
+        cells = get_cells(row, cols)
+        record['_cells'] = pack_cells(cells) if cells_mode == 2 else cells
+
+    return {k: v for k, v in record.items() if v}
+
+
+# Plain mode
+def get_row_values(row):
+    values = [parse_val(value) for value in row]
+
+    if any(x is not None for x in values):
+        return values
+
+
+def parse_val(value):
+    return value.strip() or None
+
+
+# Attribute pattern
+def get_cells(row, cols=None):
+    values = [parse_val_ext(value, col_i) for col_i, value in zip(cols or count(1), row)]
+    values = [x for x in values if x is not None]
+
+    return values
+
+
+def parse_val_ext(value, col_i):
+    value = parse_val(value)
+
+    if value is not None:
+        return {
+            'c': col_i,
+            'v': value
+        }
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Streaming reader for OpenDocument spreadsheets.
+`content.xml` is parsed incrementally, rows are released as soon as
+they are converted, repeated empty rows and cells are only counted.
+Rows are as wide as their last non-empty cell (ODS has no sheet dimension).
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from zipfile import ZipFile
+
+from ..log import log
+from ..timer import Timer
+from ..tracer import span
+from .funcs import Projection
+from .funcs import pack_cells
+from .funcs import pack_row
+from .funcs import yield_records
+
+
+NS_TABLE  = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+NS_OFFICE = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+NS_TEXT   = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+NS_DC     = "http://purl.org/dc/elements/1.1/"
+
+TABLE        = f"{{{NS_TABLE}}}table"
+ROW          = f"{{{NS_TABLE}}}table-row"
+CELL         = f"{{{NS_TABLE}}}table-cell"
+COVERED_CELL = f"{{{NS_TABLE}}}covered-table-cell"
+NAME         = f"{{{NS_TABLE}}}name"
+ROWS_REPEATED = f"{{{NS_TABLE}}}number-rows-repeated"
+COLS_REPEATED = f"{{{NS_TABLE}}}number-columns-repeated"
+
+VALUE_TYPE    = f"{{{NS_OFFICE}}}value-type"
+VALUE         = f"{{{NS_OFFICE}}}value"
+DATE_VALUE    = f"{{{NS_OFFICE}}}date-value"
+TIME_VALUE    = f"{{{NS_OFFICE}}}time-value"
+BOOLEAN_VALUE = f"{{{NS_OFFICE}}}boolean-value"
+ANNOTATION    = f"{{{NS_OFFICE}}}annotation"
+
+P         = f"{{{NS_TEXT}}}p"
+S         = f"{{{NS_TEXT}}}s"
+TAB       = f"{{{NS_TEXT}}}tab"
+LINE_BREAK = f"{{{NS_TEXT}}}line-break"
+C         = f"{{{NS_TEXT}}}c"
+CREATOR   = f"{{{NS_DC}}}creator"
+
+
+def main_yield(filename, db, options={}, **kargs):
+    sheet_list  = options.get('sheets')
+    chunk_rows  = options.get('chunk_rows', 5000)
+    row_mode    = int(options.get('row_mode', 1))
+    cells_mode  = int(options.get('cells_mode', 0))
+    budget      = db.memory_budget
+    proj        = Projection(options)
+
+    with Timer(f"[ {__name__} ] open_workbook", db.verbose) as t, \
+         span("open_workbook", module=__name__):
+        book = ZipFile(kargs.get('fileobj') or filename)
+        content = book.open('content.xml')
+
+    found = []
+
+    for shid, shname, rows in iter_tables(content):
+        found.extend([shid, shname])
+
+        if sheet_list and shid not in sheet_list and shname not in sheet_list:
+            for _ in rows:      # skip the table
+                pass
+            continue
+
+        # Already committed by an interrupted run
+        committed = db.committed_rows(shid)
+        if committed is None:
+            for _ in rows:
+                pass
+            continue
+
+        if db.verbose:
+            log.info(f"Processing: # {shid} ({shname})")
+
+        db.push_sheet_info(shid, shname)
+
+        # Rows past `max_row` are parsed to keep the stream, not converted
+        rows = ((idx, row) for idx, row in rows if proj.has_row(idx))
+
+        yield from yield_records(rows, shid, shname, chunk_rows,
+            lambda row, idx: get_record(row, row_mode, cells_mode, proj),
+            budget, indexed=True, skip=committed, skip_empty=proj.skip_empty)
+
+    for name in sheet_list or []:
+        if name not in found:
+            db.push_file_record('warning',
+                message = f"Wrong sheet name: {name}"
+            )
+
+    content.close()
+    book.close()
+
+
+def iter_tables(content):
+    """Yield `(shid, name, rows)` for every table, `rows` must be consumed
+    before the next table is requested.
+    """
+    events = ET.iterparse(content, events=('start', 'end'))
+    shid = 0
+
+    for event, elem in events:
+        if event == 'start' and elem.tag == TABLE:
+            shid += 1
+            yield shid, elem.get(NAME), iter_rows(events, elem)
+
+
+def iter_rows(events, table):
+    """Yield `(idx, cells)` for non-empty rows of the current table,
+    `cells` is a list of `(col, cell)` with 1-based columns.
+    """
+    parents = [table]
+    idx = 0
+    cells = []
+    col = 1
+
+    for event, elem in events:
+        if event == 'start':
+            parents.append(elem)
+
+            if elem.tag == ROW:
+                cells = []
+                col = 1
+
+            continue
+
+        parents.pop()
+
+        if elem.tag == CELL or elem.tag == COVERED_CELL:
+            repeated = int(elem.get(COLS_REPEATED, 1))
+            cell = parse_cell(elem)
+            if cell is None:
+                col += repeated         # empty run, nothing allocated
+
+            else:
+                for _ in range(repeated):
+                    cells.append((col, cell))
+                    col += 1
+
+        elif elem.tag == ROW:
+            repeated = int(elem.get(ROWS_REPEATED, 1))
+            if cells:
+                for _ in range(repeated):
+                    yield idx, cells
+                    idx += 1
+
+            else:
+                idx += repeated         # empty run
+
+            # Release memory
+            parents[-1].remove(elem)
+            elem.clear()
+
+        elif elem.tag == TABLE:
+            elem.clear()
+            return
+
+
+def parse_cell(elem):
+    """Return `(value, type, note)` or None for an empty cell."""
+    value_type = elem.get(VALUE_TYPE)
+
+    text = None
+    note = None
+    for child in elem:
+        if child.tag == P:
+            line = get_text(child)
+            text = line if text is None else f"{text}\n{line}"
+
+        elif child.tag == ANNOTATION:
+            note = get_note(child)
+
+    if value_type in ('float', 'percentage', 'currency'):
+        value, t = cast_number(elem.get(VALUE)), 2
+
+    elif value_type == 'date':
+        value, t = parse_date(elem.get(DATE_VALUE)), 3
+
+    elif value_type == 'time':
+        value, t = f"TIME({parse_duration(elem.get(TIME_VALUE))})", -3
+
+    elif value_type == 'boolean':
+        value, t = elem.get(BOOLEAN_VALUE) == 'true', 4
+
+    elif text is not None:
+        value, t = text.strip(), 1
+
+    else:
+        value, t = None, None
+
+    if value is None and note is None:
+        return None
+
+    return value, t, note
+
+
+def get_text(elem):
+    parts = [elem.text or '']
+    for child in elem:
+        if child.tag == S:
+            parts.append(' ' * int(child.get(C, 1)))
+        elif child.tag == TAB:
+            parts.append('\t')
+        elif child.tag == LINE_BREAK:
+            parts.append('\n')
+        else:
+            parts.append(get_text(child))
+
+        parts.append(child.tail or '')
+
+    return ''.join(parts)
+
+
+def get_note(elem):
+    author = elem.find(CREATOR)
+    return dict(
+        author = author.text if author is not None else None,
+        text = '\n'.join(get_text(p) for p in elem.iter(P))
+    )
+
+
+def cast_number(value):
+    if value is None:
+        return None
+
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+
+    return int(value)
+
+
+def parse_date(value):
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            pass
+
+    return value
+
+
+def parse_duration(value):
+    # PT12H30M00S
+    res = re.match(r"PT(\d+)H(\d+)M([\d.]+)S", value or '')
+    if not res:
+        return value
+
+    hours, minutes, seconds = res.groups()
+    return f"{int(hours):02}:{int(minutes):02}:{int(float(seconds)):02}"
+
+
+def get_record(row, row_mode, cells_mode, proj=None):
+    if proj and proj.columns:
+        row = [(col, cell) for col, cell in row if proj.has_col(col)]
+
+    record = {}
+
+    if row_mode:
+        values = get_row_values(row)
+        record['_row'] = pack_row(proj.pick(values) if proj and values else values, row_mode)
+
+    if cells_mode:
+        cells = get_cells(row)
+        record['_cells'] = pack_cells(cells) if cells_mode == 2 else cells
+
+    return {k: v for k, v in record.items() if v}
+
+
+# Plain mode
+def get_row_values(row):
+    width = max((col for col, (value, t, note) in row if value is not None), default=0)
+
+    values = [None] * width
+    for col, (value, t, note) in row:
+        if value is not None:
+            values[col - 1] = value
+
+    if width:
+        return values
+
+
+# Attribute pattern
+def get_cells(row):
+    values = []
+    for col, (value, t, note) in row:
+        cell = dict(c=col)
+        if value is not None:
+            cell.update(v=value, t=t)
+
+        if note:
+            cell['_n'] = note
+
+        values.append(cell)
+
+    return values
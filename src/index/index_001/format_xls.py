@@ -2,22 +2,39 @@
 # coding=utf-8
 # Stan 2025-09-22
 
+from functools import lru_cache
+from itertools import count
+
 import xlrd
 
-from ..chunk import chunk
+from ..log import log
 from ..timer import Timer
+from ..tracer import span
+from .funcs import Projection
 from .funcs import get_shid_name
+from .funcs import pack_cells
+from .funcs import pack_row
+from .funcs import yield_records
 
 
 def main_yield(filename, db, options={}, **kargs):
-    with Timer(f"[ {__name__} ] open_workbook", db.verbose) as t:
-        book = xlrd.open_workbook(filename, on_demand=True)
+    with Timer(f"[ {__name__} ] open_workbook", db.verbose) as t, \
+         span("open_workbook", module=__name__):
+        fileobj = kargs.get('fileobj')
+        if fileobj:
+            fileobj.seek(0)
+            book = xlrd.open_workbook(file_contents=fileobj.read(), on_demand=True)
+
+        else:
+            book = xlrd.open_workbook(filename, on_demand=True)
 
     sheet_names = book.sheet_names()
     sheet_list  = options.get('sheets', sheet_names)
     chunk_rows  = options.get('chunk_rows', 5000)
-    row_mode    = options.get('row_mode', 1)
-    cells_mode  = options.get('cells_mode', 0)
+    row_mode    = int(options.get('row_mode', 1))
+    cells_mode  = int(options.get('cells_mode', 0))
+    budget      = db.memory_budget
+    proj        = Projection(options)
 
     processed = []
 
@@ -38,149 +55,134 @@ def main_yield(filename, db, options={}, **kargs):
 
         processed.append(shid)
 
+        # Already committed by an interrupted run
+        committed = db.committed_rows(shid)
+        if committed is None:
+            continue
+
         sh = book.sheet_by_name(shname)     # string
 #       sh = book.sheet_by_index(shid)      # 0-based
 
         if db.verbose:
-            print(f"Processing: # {shid} ({sh.name}) / nrows: {sh.nrows}, ncols: {sh.ncols}")
+            log.info(f"Processing: # {shid} ({sh.name}) / nrows: {sh.nrows}, ncols: {sh.ncols}")
 
-        notes = [(k[0], k[1], v) for k, v in sh.cell_note_map.items()]
+        db.push_sheet_info(shid, shname, rows=sh.nrows, cols=sh.ncols)
 
-        for ki, chunk_i in enumerate(chunk(sh.get_rows(), chunk_rows)):
-            records = []
+        notes = {}
+        for (rowx, colx), note in sh.cell_note_map.items():
+            notes.setdefault(rowx, {})[colx + 1] = note
 
-            for kj, row in enumerate(chunk_i):
-                idx = ki * chunk_rows + kj
-                _r = idx + 1
+        # Only the projected cells are read
+        start_colx, end_colx = proj.min_col - 1, proj.max_col
 
-                notes_i = list(filter(lambda x: x[0] == idx, notes))
+        def get_record(rowx, idx):
+            types  = proj.pick(sh.row_types(rowx, start_colx, end_colx), proj.min_col)
+            values = proj.pick(sh.row_values(rowx, start_colx, end_colx), proj.min_col)
 
-                record = {}
+            record = {}
 
-                if row_mode:
-                    record['_row'] = get_row_values(row)
+            if row_mode:
+                record['_row'] = pack_row(get_row_values(types, values), row_mode)
 
-                if cells_mode:
-                    record['_cells'] = get_cells(row, notes_i)
+            if cells_mode:
+                cells = get_cells(types, values, notes.get(rowx, {}), proj.cols())
+                record['_cells'] = pack_cells(cells) if cells_mode == 2 else cells
 
-                record = {k: v for k, v in record.items() if v}
-                if record:
-                    record = dict(record, _shid=shid, _r=_r)
-                    records.append(record)
+            return {k: v for k, v in record.items() if v}
 
-            yield records
-            records = []        # release memory
+        yield from yield_records(proj.row_range(sh.nrows), shid, shname, chunk_rows,
+            get_record, budget, skip=committed, start=proj.min_row - 1,
+            skip_empty=proj.skip_empty)
 
         book.unload_sheet(shname)
     book.release_resources()
 
 
-# Plain mode
-def get_row_values(row):
-    values = [parse_cell(cell) for cell in row]
+# Converters by cell type, applied to whole rows of `row_types`/`row_values`
+@lru_cache(maxsize=65536)
+def to_datetime(value):
+    return xlrd.xldate.xldate_as_datetime(value, 0)
 
-    if any(x is not None for x in values):
-        return values
 
+def to_text(value):
+    return value.strip()
 
-def parse_cell(cell):
-    if cell.ctype == xlrd.XL_CELL_EMPTY or \
-       cell.ctype == xlrd.XL_CELL_BLANK:
-        return None
 
-    if cell.ctype == xlrd.XL_CELL_TEXT:
-        return cell.value.strip()
+def to_none(value):
+    return None
 
-    if cell.ctype == xlrd.XL_CELL_NUMBER:
-        return cell.value
 
-    if cell.ctype == xlrd.XL_CELL_DATE:
-        return xlrd.xldate.xldate_as_datetime(cell.value, 0)
+def to_same(value):
+    return value
 
-    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
-        return bool(cell.value)
 
-    if cell.ctype == xlrd.XL_CELL_ERROR:
-        return f"ERROR({cell.value})"
+def to_error(value):
+    return f"ERROR({value})"
 
-    return cell.value
 
+CONVERTERS = {
+    xlrd.XL_CELL_EMPTY:   to_none,
+    xlrd.XL_CELL_BLANK:   to_none,
+    xlrd.XL_CELL_TEXT:    to_text,
+    xlrd.XL_CELL_NUMBER:  to_same,
+    xlrd.XL_CELL_DATE:    to_datetime,
+    xlrd.XL_CELL_BOOLEAN: bool,
+    xlrd.XL_CELL_ERROR:   to_error,
+}
 
-# Attribute pattern
-def get_cells(row, notes):
-    values = []
-    for col_i, cell in enumerate(row, 1):
-        value = parse_cell_ext(cell, col_i)
+# (converter, type code) for the attribute pattern
+CONVERTERS_EXT = {
+    xlrd.XL_CELL_TEXT:    (to_text,     1),
+    xlrd.XL_CELL_NUMBER:  (to_same,     2),
+    xlrd.XL_CELL_DATE:    (to_datetime, 3),
+    xlrd.XL_CELL_BOOLEAN: (bool,        4),
+    xlrd.XL_CELL_ERROR:   (to_same,     5),
+}
+
+
+# Plain mode
+def get_row_values(types, values):
+    # Fast path: a row without conversions needed
+    if all(ctype == xlrd.XL_CELL_NUMBER for ctype in types):
+        return list(values) if values else None
 
-        note_dict = get_note(notes, col_i)
+    values = [CONVERTERS.get(ctype, to_same)(value) \
+              for ctype, value in zip(types, values)]
+
+    if any(x is not None for x in values):
+        return values
+
+
+# Attribute pattern
+def get_cells(types, values, notes, cols=None):
+    cells = []
+    for col_i, ctype, value in zip(cols or count(1), types, values):
+        if ctype == xlrd.XL_CELL_EMPTY:
+            cell = None
+
+        else:
+            func, t = CONVERTERS_EXT.get(ctype, (to_same, -ctype))   # trick for rare type
+            cell = {
+                'c': col_i,
+                'v': func(value),
+                't': t
+            }
+
+        note_dict = get_note(notes.get(col_i))
         if note_dict:
-            if value:   # dict
-                value['_n'] = note_dict
+            if cell:    # dict
+                cell['_n'] = note_dict
 
             else:
-                value = dict(c=col_i, _n=note_dict)
-
-        values.append(value)
-    values = [x for x in values if x is not None]
-
-    return values
-
-
-def parse_cell_ext(cell, col_i):
-    if cell.ctype == xlrd.XL_CELL_EMPTY:
-        return None
-
-    if cell.ctype == xlrd.XL_CELL_TEXT:
-        val = cell.value.strip()
-        return {
-            'c': col_i,
-            'v': val,
-            't': 1
-        }
-
-    if cell.ctype == xlrd.XL_CELL_NUMBER:
-        val = cell.value
-        return {
-            'c': col_i,
-            'v': val,
-            't': 2
-        }
-
-    if cell.ctype == xlrd.XL_CELL_DATE:
-        val = xlrd.xldate.xldate_as_datetime(cell.value, 0)
-        return {
-            'c': col_i,
-            'v': val,
-            't': 3
-        }
-
-    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
-        val = bool(cell.value)
-        return {
-            'c': col_i,
-            'v': val,
-            't': 4
-        }
-
-    if cell.ctype == xlrd.XL_CELL_ERROR:
-        val = cell.value
-        return {
-            'c': col_i,
-            'v': val,
-            't': 5
-        }
-
-    val = cell.value
-    return {
-        'c': col_i,
-        'v': val,
-        't': -cell.ctype   # trick for rare type
-    }
-
-
-def get_note(notes, col_i):
-    note_list = list(filter(lambda x: x[1] == col_i - 1, notes))
-    note = note_list[0][2] if note_list else None
+                cell = dict(c=col_i, _n=note_dict)
+
+        if cell is not None:
+            cells.append(cell)
+
+    return cells
+
+
+def get_note(note):
     if note:
         return dict(
             author = note.author,
@@ -2,21 +2,44 @@
 # coding=utf-8
 # Stan 2024-11-01
 
+import io
+import os
+import struct
+from collections import namedtuple
+from functools import lru_cache
+from itertools import count
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS
+from openpyxl.styles.numbers import is_date_format
 from pyxlsb import open_workbook, convert_date
+from pyxlsb import biff12
+from pyxlsb.reader import BIFF12Reader
 
-from ..chunk import chunk
+from ..log import log
 from ..timer import Timer
+from ..tracer import span
+from .funcs import Projection
 from .funcs import get_shid_name
+from .funcs import pack_cells
+from .funcs import pack_row
+from .funcs import yield_records
 
 
 def main_yield(filename, db, options={}, **kargs):
-    with Timer(f"[ {__name__} ] open_workbook", db.verbose) as t:
-        book = open_workbook(filename)
+    with Timer(f"[ {__name__} ] open_workbook", db.verbose) as t, \
+         span("open_workbook", module=__name__):
+        book = open_workbook(kargs.get('fileobj') or filename)
 
     sheet_list  = options.get('sheets', book.sheets)
     chunk_rows  = options.get('chunk_rows', 5000)
-    row_mode    = options.get('row_mode', 1)
-    cells_mode  = options.get('cells_mode', 0)
+    row_mode    = int(options.get('row_mode', 1))
+    cells_mode  = int(options.get('cells_mode', 0))
+    dates_mode  = int(options.get('dates_mode', 1))
+    budget      = db.memory_budget
+    proj        = Projection(options)
+
+    # Style id -> is_date lookup table, parsed once per workbook
+    date_styles = get_date_styles(book) if dates_mode else frozenset()
 
     processed = []
 
@@ -37,65 +60,180 @@ def main_yield(filename, db, options={}, **kargs):
 
         processed.append(shid)
 
+        # Already committed by an interrupted run
+        committed = db.committed_rows(shid)
+        if committed is None:
+            continue
+
         # get_sheet accepts 1-based integer as well as string
         sh = book.get_sheet(name)
 
         if db.verbose:
-            print(f"Processing: # {shid} ({sh.name}) / dimension: {sh.dimension}")
+            log.info(f"Processing: # {shid} ({sh.name}) / dimension: {sh.dimension}")
 
-        for ki, chunk_i in enumerate(chunk(sh.rows(), chunk_rows)):
-            records = []
+        dim = sh.dimension
+        db.push_sheet_info(shid, shname,
+            rows = dim.r + dim.h if dim else None,
+            cols = dim.c + dim.w if dim else None
+        )
 
-            for kj, row in enumerate(chunk_i):
-                record = {}
+        yield from yield_records(iter_rows(sh, proj), shid, shname, chunk_rows,
+            lambda row, idx: get_record(proj.pick(row), row_mode, cells_mode,
+                                        date_styles, proj.cols()),
+            budget, indexed=True, skip=committed, skip_empty=proj.skip_empty)
 
-                if row_mode:
-                    record['_row'] = get_row_values(row)
+        sh.close()
+    book.close()
 
-                if cells_mode:
-                    record['_cells'] = get_cells(row)
 
-                record = {k: v for k, v in record.items() if v}
-                if record:
-                    idx = ki * chunk_rows + kj
-                    _r = idx + 1
+def get_record(row, row_mode, cells_mode, date_styles, cols=None):
+    record = {}
 
-                    record = dict(record, _shid=shid, _r=_r)
-                    records.append(record)
+    if row_mode:
+        record['_row'] = pack_row(get_row_values(row, date_styles), row_mode)
 
-            yield records
-            records = []        # release memory
+    if cells_mode:
+        cells = get_cells(row, date_styles, cols)
+        record['_cells'] = pack_cells(cells) if cells_mode == 2 else cells
+
+    return {k: v for k, v in record.items() if v}
+
+
+# Cell with a style id (`pyxlsb.worksheet.Cell` drops it)
+Cell = namedtuple('Cell', ['r', 'c', 'v', 's'])
+
+
+def iter_rows(sh, proj=None):
+    """Same as `Worksheet.rows()`, but keeps the style id of every cell
+    and yields `(idx, row)` for rows present within the projection only.
+    """
+    width = sh.dimension.c + sh.dimension.w if sh.dimension else 0
+
+    sh._reader.seek(sh._data_offset, os.SEEK_SET)
+    row_num = -1
+    row = None
+    for recid, item in sh._reader:
+        if recid == biff12.ROW and item.r != row_num:
+            if row is not None:
+                yield row_num, row
+
+            row_num = item.r
+            row = None
+
+            if proj and not proj.has_row(row_num):
+                if proj.after(row_num):
+                    return
+                continue                # cells of the row are passed over
+
+            row = [Cell(row_num, i, None, 0) for i in range(width)]
+
+        elif biff12.BLANK <= recid <= biff12.FORMULA_BOOLERR:
+            if row is None:
+                continue
+
+            value = item.v
+            if recid == biff12.STRING and sh._stringtable is not None:
+                value = sh._stringtable[value]
+
+            row[item.c] = Cell(row_num, item.c, value, item.style & 0xFFFFFF)
+
+        elif recid == biff12.SHEETDATA_END:
+            if row is not None:
+                yield row_num, row
+
+            break
 
-        sh.close()
-    book.close()
+
+# Number format record (BrtFmt), absent in `pyxlsb.biff12`
+FMT = 0x002C
+
+# Built-in locale dependent date formats absent in `BUILTIN_FORMATS`
+BUILTIN_DATE_FORMATS = frozenset(range(27, 37)) | frozenset(range(50, 59))
+
+uint16_t = struct.Struct('<H')
+uint32_t = struct.Struct('<I')
+
+
+def get_date_styles(book):
+    """Parse `xl/styles.bin` and return the set of cell style ids
+    which have a date number format.
+    """
+    try:
+        with book._zf.open('xl/styles.bin', 'r') as f:
+            data = f.read()
+
+    except KeyError:
+        return frozenset()
+
+    reader = BIFF12Reader(fp=io.BytesIO(data))
+    formats = dict(BUILTIN_FORMATS)
+    date_styles = set()
+    in_cell_xfs = False
+    xf_id = 0
+
+    while True:
+        recid = reader.read_id()
+        reclen = reader.read_len()
+        if recid is None or reclen is None:
+            break
+
+        rec = reader._fp.read(reclen)
+
+        if recid == FMT:
+            ifmt, = uint16_t.unpack_from(rec, 0)
+            length, = uint32_t.unpack_from(rec, 2)
+            formats[ifmt] = rec[6:6 + length * 2].decode('utf-16-le', errors='replace')
+
+        elif recid == biff12.CELLXFS:
+            in_cell_xfs = True
+
+        elif recid == biff12.CELLXFS_END:
+            break
+
+        elif recid == biff12.XF and in_cell_xfs:
+            ifmt, = uint16_t.unpack_from(rec, 2)
+            if ifmt in BUILTIN_DATE_FORMATS or is_date_format(formats.get(ifmt)):
+                date_styles.add(xf_id)
+
+            xf_id += 1
+
+    return frozenset(date_styles)
+
+
+@lru_cache(maxsize=65536)
+def to_datetime(value):
+    return convert_date(value)
 
 
 # Plain mode
-def get_row_values(row):
-    values = [parse_val(cell.v) for cell in row]
+def get_row_values(row, date_styles):
+    values = [parse_val(cell.v, cell.s in date_styles) for cell in row]
 
     if any(x is not None for x in values):
         return values
 
 
-def parse_val(value):
+def parse_val(value, is_date=False):
     if isinstance(value, str):
         value = value.strip()
 
+    elif is_date and isinstance(value, float):
+        value = to_datetime(value)
+
     return value
 
 
 # Attribute pattern
-def get_cells(row):
-    values = [parse_val_ext(cell.v, col_i) for col_i, cell in enumerate(row, 1)]
+def get_cells(row, date_styles, cols=None):
+    values = [parse_val_ext(cell.v, col_i, cell.s in date_styles) \
+              for col_i, cell in zip(cols or count(1), row)]
     values = [x for x in values if x is not None]
 
     return values
 
 
-def parse_val_ext(value, col_i):
-    if isinstance(value, str):
-        value = value.strip()
+def parse_val_ext(value, col_i, is_date=False):
+    value = parse_val(value, is_date)
 
     if value is not None:
         return {
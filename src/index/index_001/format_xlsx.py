@@ -3,24 +3,64 @@
 # Stan 2024-11-01
 
 import datetime
+from itertools import count
 
 from openpyxl import load_workbook
 
-from ..chunk import chunk
+from ..log import log
 from ..timer import Timer
+from ..tracer import span
+from .funcs import Projection
 from .funcs import get_shid_name
+from .funcs import pack_cells
+from .funcs import pack_row
+from .funcs import yield_records
+from .xlsx_parallel import get_pool
+from .xlsx_parallel import iter_sheet_rows
 
 
 def main_yield(filename, db, options={}, **kargs):
-    with Timer(f"[ {__name__} ] load_workbook", db.verbose) as t:
-        book = load_workbook(filename, data_only=True)
+    row_mode    = int(options.get('row_mode', 1))
+    cells_mode  = int(options.get('cells_mode', 0))
+    parallel    = int(options.get('parallel') or 0)               # processes per sheet
+    range_size  = float(options.get('parallel_range') or 8)     # MB of sheet XML per task
+    preview     = options.get('preview')
+    source      = kargs.get('fileobj') or filename
+
+    # Intra-sheet parallelism for plain rows only (notes need the full load)
+    if parallel > 1 and (cells_mode or not row_mode):
+        log.info(f"[ {__name__} ] parallel mode requires row_mode without cells_mode, using serial mode")
+        parallel = 0
+
+    with Timer(f"[ {__name__} ] load_workbook", db.verbose) as t, \
+         span("load_workbook", module=__name__):
+        # Streamed sheets stop at `max_row` (no notes in read-only mode)
+        read_only = parallel > 1 or bool(preview and not cells_mode)
+        book = load_workbook(source, data_only=True, read_only=read_only)
 
     sheet_names = book.get_sheet_names()
     sheet_list  = options.get('sheets', sheet_names)
     chunk_rows  = options.get('chunk_rows', 5000)
-    row_mode    = options.get('row_mode', 1)
-    cells_mode  = options.get('cells_mode', 0)
+    budget      = db.memory_budget
+    proj        = Projection(options)
 
+    pool = None
+    if parallel > 1:
+        pool = get_pool(book, parallel)
+
+    try:
+        yield from yield_sheets(source, db, book, sheet_names, sheet_list,
+            chunk_rows, row_mode, cells_mode, budget, proj, pool, parallel, range_size)
+
+    finally:
+        if pool:
+            pool.terminate()
+
+        book.close()
+
+
+def yield_sheets(source, db, book, sheet_names, sheet_list, chunk_rows,
+                 row_mode, cells_mode, budget, proj, pool, parallel, range_size):
     processed = []
 
     for name in sheet_list:         # 1-based integer or string
@@ -40,36 +80,53 @@ def main_yield(filename, db, options={}, **kargs):
 
         processed.append(shid)
 
+        # Already committed by an interrupted run
+        committed = db.committed_rows(shid)
+        if committed is None:
+            continue
+
         sh = book[shname]               # string
 #       sh = book.worksheets[shid-1]    # 0-based
 
         if db.verbose:
-            print(f"Processing: # {shid} ({sh.title}) / max_row: {sh.max_row}, max_column: {sh.max_column}")
+            log.info(f"Processing: # {shid} ({sh.title}) / max_row: {sh.max_row}, max_column: {sh.max_column}")
+
+        db.push_sheet_info(shid, shname, rows=sh.max_row, cols=sh.max_column)
 
-        for ki, chunk_i in enumerate(chunk(sh.iter_rows(), chunk_rows)):
-            records = []
+        if pool:
+            rows = iter_sheet_rows(source, book, shname, pool, parallel,
+                                   int(range_size * (1 << 20)), budget, proj)
+
+            yield from yield_records(rows, shid, shname, chunk_rows,
+                lambda values, idx: {'_row': pack_row(values, row_mode)}, budget,
+                indexed=True, skip=committed, skip_empty=proj.skip_empty)
+            continue
 
-            for kj, row in enumerate(chunk_i):
-                record = {}
+        # Only the projected cells are read, bounds within the sheet
+        # (unknown in read-only mode without the dimension tag)
+        max_row = min(filter(None, (proj.max_row, sh.max_row)), default=None)
+        max_col = min(filter(None, (proj.max_col, sh.max_column)), default=None)
+        rows = sh.iter_rows(min_row=proj.min_row, max_row=max_row,
+                            min_col=proj.min_col, max_col=max_col)
 
-                if row_mode:
-                    record['_row'] = get_row_values(row)
+        yield from yield_records(rows, shid, shname, chunk_rows,
+            lambda row, idx: get_record(proj.pick(row, proj.min_col), row_mode,
+                                        cells_mode, proj.cols()),
+            budget, skip=committed, start=proj.min_row - 1,
+            skip_empty=proj.skip_empty)
 
-                if cells_mode:
-                    record['_cells'] = get_cells(row)
 
-                record = {k: v for k, v in record.items() if v}
-                if record:
-                    idx = ki * chunk_rows + kj
-                    _r = idx + 1
+def get_record(row, row_mode, cells_mode, cols=None):
+    record = {}
 
-                    record = dict(record, _shid=shid, _r=_r)
-                    records.append(record)
+    if row_mode:
+        record['_row'] = pack_row(get_row_values(row), row_mode)
 
-            yield records
-            records = []        # release memory
+    if cells_mode:
+        cells = get_cells(row, cols)
+        record['_cells'] = pack_cells(cells) if cells_mode == 2 else cells
 
-    book.close()
+    return {k: v for k, v in record.items() if v}
 
 
 # Plain mode
@@ -117,9 +174,9 @@ def parse_cell(cell):
 
 
 # Attribute pattern
-def get_cells(row):
+def get_cells(row, cols=None):
     values = []
-    for col_i, cell in enumerate(row, 1):
+    for col_i, cell in zip(cols or count(1), row):
         value = parse_cell_ext(cell, col_i)
 
         note_dict = get_note(cell)
@@ -2,6 +2,15 @@
 # coding=utf-8
 # Stan 2025-09-27
 
+from itertools import count
+from itertools import islice
+
+from ..chunk import chunk
+from ..chunk import chunk_adaptive
+from ..tracer import span
+from ..tracer import traced
+
+
 def get_shid_name(sheet_names, name):
     if isinstance(name, int):
         if len(sheet_names) < name:
@@ -17,3 +26,260 @@ def get_shid_name(sheet_names, name):
         shid0 = sheet_names.index(name)
 
     return shid0 + 1, name
+
+
+class Projection(object):
+    """Rows and columns to read: `min_row`, `max_row` (1-based, inclusive),
+    `columns` ("A:F", "A,C,E:G" or a list of letters/numbers) and
+    `skip_empty_rows` (drop rows made of empty strings too) of parser.cfg.
+    """
+    def __init__(self, options={}):
+        self.min_row = int(options.get('min_row') or 1)
+        self.max_row = options.get('max_row')
+        if self.max_row is not None:
+            self.max_row = int(self.max_row)
+        self.skip_empty = options.get('skip_empty_rows')
+        self.columns = parse_columns(options.get('columns'))
+
+        self.min_col = 1
+        self.max_col = None
+        self.positions = None
+
+        if self.columns:
+            self.min_col = min(self.columns)
+            self.max_col = max(self.columns)
+            if self.columns != list(range(self.min_col, self.max_col + 1)):
+                self.positions = [col - self.min_col for col in self.columns]
+
+    def pick(self, row, offset=1):
+        """Selected cells of `row` which starts with column `offset`."""
+        if not self.columns:
+            return row
+
+        start = self.min_col - offset
+        row = row[start:self.max_col - offset + 1]
+        if self.positions is None:
+            return row
+
+        return [row[i] for i in self.positions if i < len(row)]
+
+    def cols(self):
+        """Column numbers of picked cells (enumerate `count(1)` if all)."""
+        return self.columns or count(1)
+
+    def has_col(self, col):
+        return not self.columns or col in self.columns
+
+    def row_range(self, nrows):
+        """0-based row indexes for readers with random access to rows."""
+        end = nrows if self.max_row is None else min(nrows, self.max_row)
+        return range(self.min_row - 1, end)
+
+    def has_row(self, idx):
+        return idx >= self.min_row - 1 and \
+               (self.max_row is None or idx < self.max_row)
+
+    def after(self, idx):
+        """True once the 0-based `idx` is past `max_row`."""
+        return self.max_row is not None and idx >= self.max_row
+
+
+def parse_columns(columns):
+    if not columns:
+        return None
+
+    if isinstance(columns, (str, int)):
+        columns = str(columns).split(',')
+
+    result = []
+    for item in columns:
+        if isinstance(item, str) and ':' in item:
+            first, last = item.split(':')
+            result.extend(range(column_index(first), column_index(last) + 1))
+
+        else:
+            result.append(column_index(item))
+
+    return sorted(set(result))
+
+
+def column_index(name):
+    """'A' -> 1, 'AA' -> 27, '3' -> 3"""
+    if isinstance(name, int):
+        return name
+
+    name = name.strip().upper()
+    if name.isdigit():
+        return int(name)
+
+    index = 0
+    for ch in name:
+        index = index * 26 + ord(ch) - 64
+
+    return index
+
+
+def is_empty_record(record):
+    """No values other than None and empty strings, no notes."""
+    row = record.get('_row')
+    if isinstance(row, dict):
+        row = row.values()
+
+    values = list(row or [])
+
+    cells = record.get('_cells')
+    if isinstance(cells, dict):         # cells_mode = 2
+        if cells.get('n'):
+            return False
+        values.extend(cells['v'])
+
+    else:
+        for cell in cells or []:
+            if '_n' in cell:
+                return False
+            values.append(cell.get('v'))
+
+    return all(value is None or value == '' for value in values)
+
+
+# Sparse row encoding (row_mode = 2, 3)
+def pack_row(values, row_mode):
+    """row_mode = 1: dense list (as is)
+    row_mode = 2: list with trailing empty cells trimmed
+    row_mode = 3: {'<col>': value} map of non-empty cells (1-based columns)
+    """
+    if row_mode not in (1, 2, 3):
+        raise ValueError(f"Unknown row_mode: {row_mode!r}")
+
+    if not values or row_mode == 1:
+        return values
+
+    if row_mode == 3:
+        return {str(col): value for col, value in enumerate(values, 1) \
+                if value is not None}
+
+    end = len(values)
+    while end and values[end - 1] is None:
+        end -= 1
+
+    return values[:end]
+
+
+def expand_row(row, width=None):
+    """Reader helper: restore a dense list from any `row_mode` encoding."""
+    if isinstance(row, dict):
+        row = {int(col): value for col, value in row.items()}
+        values = [None] * max(row, default=0)
+        for col, value in row.items():
+            values[col - 1] = value
+
+    else:
+        values = list(row or [])
+
+    if width and len(values) < width:
+        values += [None] * (width - len(values))
+
+    return values
+
+
+# Compact cells encoding (cells_mode = 2)
+def pack_cells(cells):
+    """Convert a list of cell dicts to parallel arrays:
+    {'c': [col, ...], 'v': [value, ...], 't': [type, ...], 'n': [note, ...]}
+    Notes are stored as a sparse side array, each note carries its column.
+    """
+    cols, values, types, notes = [], [], [], []
+
+    for cell in cells:
+        if 'v' in cell:
+            cols.append(cell['c'])
+            values.append(cell['v'])
+            types.append(cell.get('t'))
+
+        if '_n' in cell:
+            notes.append(dict(cell['_n'], c=cell['c']))
+
+    packed = dict(c=cols, v=values)
+
+    if any(t is not None for t in types):
+        packed['t'] = types
+
+    if notes:
+        packed['n'] = notes
+
+    return packed if cols or notes else None
+
+
+def expand_cells(packed):
+    """Reader helper: restore the `cells_mode = 1` list from `pack_cells` output."""
+    if not isinstance(packed, dict):
+        return packed
+
+    types = packed.get('t')
+
+    cells = {}
+    for i, (col, value) in enumerate(zip(packed['c'], packed['v'])):
+        cell = dict(c=col, v=value)
+        if types is not None:
+            cell['t'] = types[i]
+
+        cells[col] = cell
+
+    for note in packed.get('n', []):
+        note = dict(note)
+        col = note.pop('c')
+        cells.setdefault(col, dict(c=col))['_n'] = note
+
+    return [cells[col] for col in sorted(cells)]
+
+
+def yield_records(rows, shid, shname, chunk_rows, get_record, budget=None,
+                  indexed=False, skip=0, start=0, skip_empty=False):
+    """Group sheet rows into chunks of records.
+    `get_record(row, idx)` converts a row (0-based `idx`) to a dict or None.
+    With `indexed` the rows are `(idx, row)` pairs, so readers can skip
+    rows without yielding them, otherwise the rows start with `start`.
+    With a memory `budget` the chunk size shrinks under memory pressure.
+    The first `skip` rows (already committed) are passed over unconverted.
+    With `skip_empty` records of empty strings only are dropped.
+    """
+    if indexed:
+        if skip:
+            rows = ((i, row) for i, row in rows if i >= skip)
+
+    else:
+        skip = max(skip, start)
+        if skip > start:
+            rows = islice(rows, skip - start, None)
+
+    if budget:
+        chunks = chunk_adaptive(rows, lambda: budget.chunk_size(chunk_rows))
+    else:
+        chunks = chunk(rows, chunk_rows)
+
+    chunks = traced(chunks, "read_chunk", shid=shid)
+
+    idx = skip
+    with span("sheet", shid=shid, name=shname):
+        for ki, chunk_i in enumerate(chunks):
+            with span("parse_chunk", shid=shid, chunk=ki, rows=len(chunk_i)):
+                records = []
+
+                for row in chunk_i:
+                    if indexed:
+                        idx, row = row
+
+                    record = get_record(row, idx)
+                    if record and skip_empty and is_empty_record(record):
+                        record = None
+
+                    if record:
+                        _r = idx + 1
+
+                        record = dict(record, _shid=shid, _r=_r)
+                        records.append(record)
+
+                    idx += 1
+
+            yield records
+            records = []        # release memory
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Header detection and typed named fields (header_mode).
+
+header_mode = 1: add `_fields` {name: typed value} to every data row
+header_mode = 2: same, but drop `_row`/`_cells` from data rows
+
+The header is taken from `header` (LIST of names) or `header_row`
+(1-based row number) of parser.cfg, otherwise it is detected in the first
+`header_sample` rows of the sheet. Field types are inferred from the same
+sample once per sheet. A resumed sheet uses the schema saved by the
+interrupted run, its first rows are not read again.
+"""
+
+import re
+from datetime import datetime
+
+from .funcs import expand_cells
+from .funcs import expand_row
+
+
+INT_RE   = re.compile(r"^[+-]?\d+$")
+FLOAT_RE = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+CODE_RE  = re.compile(r"^[+-]?0\d")     # zero-padded codes: '007'
+
+
+def with_header(chunks, db, options={}):
+    """Wrap `main_yield` output and add named, typed fields."""
+    header_mode = int(options.get('header_mode', 1))
+    sample_size = int(options.get('header_sample', 20))
+
+    schema = None
+    shid = None
+    buffer = []
+
+    for records in chunks:
+        out = []
+
+        for record in records:
+            if record['_shid'] != shid:
+                if buffer:
+                    schema = get_schema(buffer, db, options)
+                    out.extend(apply_schema(buffer, schema, header_mode))
+                    buffer = []
+
+                shid = record['_shid']
+                schema = get_saved_schema(db, shid)
+
+            if schema is None:
+                buffer.append(record)
+                if len(buffer) < sample_size:
+                    continue
+
+                schema = get_schema(buffer, db, options)
+                out.extend(apply_schema(buffer, schema, header_mode))
+                buffer = []
+                continue
+
+            out.extend(apply_schema([record], schema, header_mode))
+
+        # Rows kept for the sample are yielded later
+        if out:
+            yield out
+
+    if buffer:
+        schema = get_schema(buffer, db, options)
+        yield list(apply_schema(buffer, schema, header_mode))
+
+
+class Schema(object):
+    def __init__(self, shid, header_r, fields, types):
+        self.shid = shid
+        self.header_r = header_r
+        self.fields = fields
+        self.types = types
+
+    def convert(self, values):
+        """Named values, cells beyond the header get numbered names."""
+        fields, types = self.fields, self.types
+        if len(values) > len(fields):
+            fields = normalize_names(fields + [None] * (len(values) - len(fields)))
+            types = types + [None] * (len(values) - len(types))
+
+        doc = {}
+        for name, t, value in zip(fields, types, values):
+            if value is not None:
+                doc[name] = cast(value, t)
+
+        return doc
+
+
+def get_schema(records, db, options):
+    shid = records[0]['_shid']
+    rows = [(record['_r'], get_values(record)) for record in records]
+
+    header = options.get('header')
+    header_r = options.get('header_row')
+    if header_r is not None:
+        header_r = int(header_r)
+
+    # Names given without {{ LIST }}
+    if isinstance(header, str):
+        header = [ name.strip() for name in header.split(',') ]
+
+    if header:
+        names = header
+
+    else:
+        if header_r is None:
+            header_r = detect_header(rows)
+
+        elif not any(r == header_r for r, values in rows):
+            header_r = None
+
+        if header_r is None:    # no header, numbered fields
+            names = [None] * max((len(values) for r, values in rows), default=0)
+
+        else:
+            names = next(values for r, values in rows if r == header_r)
+
+    fields = normalize_names(names)
+    data = [values for r, values in rows if header_r is None or r > header_r]
+
+    types = infer_types(data, len(fields))
+
+    db.push_file_record('schema',
+        shid = shid,
+        header_r = header_r,
+        fields = fields,
+        types = types
+    )
+
+    return Schema(shid, header_r, fields, types)
+
+
+def get_saved_schema(db, shid):
+    """Schema of a sheet resumed after its first rows, None otherwise."""
+    if not db.checkpoint or not db.committed_rows(shid):
+        return None
+
+    res = db.find_schema(shid)
+    if res:
+        return Schema(shid, res.get('header_r'), res['fields'], res['types'])
+
+
+def apply_schema(records, schema, header_mode):
+    for record in records:
+        if schema.header_r is not None and record['_r'] <= schema.header_r:
+            yield record
+            continue
+
+        doc = schema.convert(get_values(record))
+        if header_mode == 2:
+            record = {k: v for k, v in record.items() if k not in ('_row', '_cells')}
+
+        if doc:
+            record = dict(record, _fields=doc)
+
+        yield record
+
+
+def get_values(record):
+    if '_row' in record:
+        return expand_row(record['_row'])
+
+    values = []
+    for cell in expand_cells(record.get('_cells')) or []:
+        if 'v' in cell:
+            values.extend([None] * (cell['c'] - len(values)))
+            values[cell['c'] - 1] = cell['v']
+
+    return values
+
+
+def detect_header(rows):
+    """The first row made of strings only which is at least half as wide
+    as the widest row of the sample.
+    """
+    counts = [sum(1 for x in values if x is not None) for r, values in rows]
+    widest = max(counts, default=0)
+
+    for (r, values), count in zip(rows, counts):
+        if count and count * 2 >= widest and \
+           all(isinstance(x, str) for x in values if x is not None):
+            return r
+
+
+def normalize_names(names):
+    fields = []
+    for i, name in enumerate(names, 1):
+        field = re.sub(r"\W+", "_", str(name if name is not None else '')).strip('_').lower()
+        if not field:
+            field = f"col{i}"
+
+        elif field[0].isdigit():
+            field = f"c{field}"
+
+        unique, n = field, 1
+        while unique in fields:
+            n += 1
+            unique = f"{field}_{n}"
+
+        fields.append(unique)
+
+    return fields
+
+
+def value_type(value):
+    if isinstance(value, bool):
+        return 'bool'
+
+    if isinstance(value, int):
+        return 'int'
+
+    if isinstance(value, float):
+        return 'int' if value.is_integer() else 'float'
+
+    if isinstance(value, datetime):
+        return 'date'
+
+    if isinstance(value, str):
+        value = value.strip()
+        if CODE_RE.match(value):
+            return 'str'
+
+        if INT_RE.match(value):
+            return 'int'
+
+        if FLOAT_RE.match(value):
+            return 'float'
+
+    return 'str'
+
+
+def infer_types(rows, width):
+    types = []
+    for i in range(width):
+        found = {value_type(values[i]) for values in rows \
+                 if i < len(values) and values[i] is not None}
+
+        if not found:
+            t = None
+        elif len(found) == 1:
+            t, = found
+        elif found <= {'int', 'float'}:
+            t = 'float'
+        else:
+            t = 'str'
+
+        types.append(t)
+
+    return types
+
+
+def cast(value, t):
+    """The value of the field type, values which do not fit are kept as is."""
+    if value is None or t is None:
+        return value
+
+    if isinstance(value, str) and CODE_RE.match(value.strip()):
+        return value
+
+    try:
+        if t == 'int':
+            if isinstance(value, float) and not value.is_integer():
+                return value
+            return int(value)
+
+        if t == 'float':
+            return float(value)
+
+        if t == 'str':
+            return value if isinstance(value, str) else str(value)
+
+    except (TypeError, ValueError):
+        pass
+
+    return value
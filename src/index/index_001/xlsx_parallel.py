@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Parallel parsing of a single xlsx worksheet (`parallel` processes).
+
+The sheet XML is extracted from the zip once and split into row-aligned
+byte ranges. Every range is parsed by openpyxl's `WorkSheetParser` in a
+worker process with the shared strings and date styles of the workbook,
+which workers receive once at start. Results are taken back in range
+order, so rows and `_r` are the same as in serial mode. With tracing
+enabled every range returns its `parse_range` span, which the parent
+writes to the trace (one row of spans per worker process).
+
+Rows are expected to have the `r` attribute (always written by Excel).
+"""
+
+import os
+import re
+import shutil
+import tempfile
+from collections import deque, namedtuple
+from io import BytesIO
+from multiprocessing import Pool
+from time import perf_counter
+from zipfile import ZipFile
+
+from openpyxl.utils import column_index_from_string
+from openpyxl.worksheet._reader import WorkSheetParser
+
+from ..tracer import tracer, span
+
+
+ROW_RE       = re.compile(rb"<(?:\w+:)?row[\s>/]")
+SHEETDATA_RE = re.compile(rb"<((?:\w+:)?)sheetData\b[^>]*?(/?)>")
+ROOT_RE      = re.compile(rb"<((?:\w+:)?worksheet)\b")
+COLUMN_RE    = re.compile(rb"<(?:\w+:)?c\b[^>]*?\br=\"([A-Z]{1,3})\d+\"")
+MERGE_RE     = re.compile(rb"<(?:\w+:)?mergeCell\b[^>]*?\bref=\"[A-Z]{1,3}\d+:([A-Z]{1,3})\d+\"")
+
+BLOCK_SIZE = 1 << 16
+
+# Python objects of parsed rows take several times the XML size
+MEMORY_FACTOR = 10
+
+Cell = namedtuple('Cell', ['value', 'data_type'])
+
+EMPTY = Cell(None, 'n')
+
+# Read-only workbook tables of a worker process
+tables = {}
+
+
+def init_worker(shared_strings, epoch, date_formats, timedelta_formats):
+    tables.update(
+        shared_strings = shared_strings,
+        epoch = epoch,
+        date_formats = date_formats,
+        timedelta_formats = timedelta_formats
+    )
+
+
+def get_pool(book, processes):
+    initargs = (book.shared_strings, book.epoch,
+                book._date_formats, book._timedelta_formats)
+
+    init_worker(*initargs)      # for ranges parsed in the main process
+
+    return Pool(processes, initializer=init_worker, initargs=initargs)
+
+
+def iter_sheet_rows(source, book, shname, pool, processes, range_size,
+                    budget=None, proj=None):
+    """Yield `(idx, values)` for non-empty rows of the sheet within
+    the rows and columns of the projection `proj`, `source` is the path
+    or the file object of the workbook.
+    """
+    path = book[shname]._worksheet_path
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        xml_file = os.path.join(temp_dir, "sheet.xml")
+
+        with span("extract_sheet", path=path), \
+             ZipFile(source) as zf, \
+             zf.open(path) as src, \
+             open(xml_file, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+
+        ranges = split_ranges(xml_file, range_size)
+        if not ranges:
+            return
+
+        prefix, suffix, ranges = ranges
+        tasks = [(xml_file, prefix, start, end, suffix if i < len(ranges) - 1 else b'')
+                 for i, (start, end) in enumerate(ranges)]
+
+        # Workers only when the ranges fit into the memory budget
+        estimate = range_size * processes * 2 * MEMORY_FACTOR
+        if len(tasks) == 1 or (budget and not budget.allows(estimate)):
+            pool = None
+
+        with span("scan_columns", ranges=len(tasks)):
+            if pool:
+                max_col = max(pool.imap_unordered(scan_range, tasks))
+            else:
+                max_col = max(map(scan_range, tasks))
+
+        if not max_col:
+            return
+
+        trace = tracer.enabled
+
+        if not pool:
+            for task in tasks:
+                rows, past, events = parse_range(task, max_col, proj, trace)
+                tracer.extend(events)
+                yield from rows
+                if past:
+                    return
+            return
+
+        # Bounded window of ranges in progress, taken in order
+        window = deque()
+        for task in tasks:
+            window.append(pool.apply_async(parse_range, (task, max_col, proj, trace)))
+            if len(window) >= processes * 2:
+                rows, past, events = window.popleft().get()
+                tracer.extend(events)
+                yield from rows
+                if past:
+                    return      # ranges past `max_row` are not submitted
+
+        while window:
+            rows, past, events = window.popleft().get()
+            tracer.extend(events)
+            yield from rows
+            if past:
+                return
+
+
+def split_ranges(xml_file, range_size):
+    """Return `(prefix, suffix, [(start, end)])` or None for an empty sheet.
+    `prefix` is the XML up to `<sheetData>` which every range is parsed with.
+    """
+    size = os.path.getsize(xml_file)
+
+    with open(xml_file, 'rb') as f:
+        head = b''
+        while True:
+            block = f.read(BLOCK_SIZE)
+            head += block
+            res = SHEETDATA_RE.search(head)
+            if res or not block:
+                break
+
+        if not res or res.group(2):     # `<sheetData/>`
+            return None
+
+        root = ROOT_RE.search(head)
+        prefix = head[:res.end()]
+        suffix = b"</" + res.group(1) + b"sheetData></" + root.group(1) + b">"
+
+        starts = [res.end()]
+        pos = starts[0] + range_size
+        while pos < size:
+            found = find_row(f, pos)
+            if found is None:
+                break
+
+            starts.append(found)
+            pos = found + max(range_size, BLOCK_SIZE)
+
+    ranges = list(zip(starts, starts[1:] + [size]))
+    return prefix, suffix, ranges
+
+
+def find_row(f, pos):
+    """Offset of the first `<row` tag at or after `pos`."""
+    while True:
+        f.seek(pos)
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            return None
+
+        res = ROW_RE.search(block)
+        if res:
+            return pos + res.start()
+
+        if len(block) < BLOCK_SIZE:
+            return None             # no rows up to the end of the file
+
+        pos += len(block) - 16      # a tag may cross the block boundary
+
+
+def read_range(task):
+    xml_file, prefix, start, end, suffix = task
+    with open(xml_file, 'rb') as f:
+        f.seek(start)
+        return prefix + f.read(end - start) + suffix
+
+
+def scan_range(task):
+    """The last column of the range (cells and merged ranges), 0 if none."""
+    data = read_range(task)
+    letters = set(COLUMN_RE.findall(data)) | set(MERGE_RE.findall(data))
+
+    return max((column_index_from_string(x.decode()) for x in letters), default=0)
+
+
+def parse_range(task, max_col, proj=None, trace=False):
+    """Return `([(idx, values)], past, events)`, `past` is True when the
+    range reaches beyond `max_row` of the projection, `events` are trace
+    events of the worker (with `trace` only).
+    """
+    start = perf_counter()
+    rows, past = read_rows(task, max_col, proj)
+
+    events = []
+    if trace:
+        events.append(tracer.event("parse_range", start, perf_counter(),
+                                   offset=task[2], size=task[3] - task[2], rows=len(rows)))
+
+    return rows, past, events
+
+
+def read_rows(task, max_col, proj=None):
+    """Non-empty rows of the range within the projection and `past`."""
+    from .format_xlsx import get_row_values
+
+    parser = WorkSheetParser(BytesIO(read_range(task)),
+        tables['shared_strings'],
+        data_only = True,
+        epoch = tables['epoch'],
+        date_formats = tables['date_formats'],
+        timedelta_formats = tables['timedelta_formats']
+    )
+
+    rows = []
+    for _, cells in parser.parse():
+        if not cells:
+            continue
+
+        idx = cells[0]['row'] - 1
+        if proj and not proj.has_row(idx):
+            if proj.after(idx):
+                return rows, True
+            continue
+
+        row = [EMPTY] * max_col
+        for cell in cells:
+            row[cell['column'] - 1] = Cell(cell['value'], cell['data_type'])
+
+        if proj:
+            row = proj.pick(row)
+
+        values = get_row_values(row)
+        if values:
+            rows.append((idx, values))
+
+    return rows, False
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Queue-backed logging: records are put into a queue by any thread or
+(forked) process and written by a background listener thread, so a slow
+terminal never blocks indexing.
+
+    log.info("message", extra=fields(total=1000))
+
+Plain output is the message only, JSON output is one object per line
+with `time`, `level`, `process`, `thread`, `message` and the fields.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime
+
+
+logger = logging.getLogger('index')
+
+listener = None
+log_queue = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        doc = dict(
+            time = datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            level = record.levelname,
+            process = record.process,
+            thread = record.threadName,
+            message = record.getMessage(),
+            ** getattr(record, 'fields', {})
+        )
+        if record.exc_info:
+            doc['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(doc, default=str, ensure_ascii=False)
+
+
+def setup(level=logging.INFO, json_format=False, stream=None):
+    """(Re)configure the logger, the listener writes to `stream` (stdout)."""
+    global listener, log_queue
+
+    shutdown()
+
+    try:
+        import multiprocessing
+        log_queue = multiprocessing.Queue(-1)   # shared with forked workers
+
+    except (ImportError, OSError):
+        log_queue = queue.SimpleQueue()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter("%(message)s"))
+
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(level)
+    logger.propagate = False
+
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+
+    # Stop before multiprocessing closes the queue at exit
+    atexit.unregister(shutdown)
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush queued records and stop the listener."""
+    global listener
+
+    if listener:
+        listener.stop()
+        listener = None
+
+
+def init_worker(q, level=logging.INFO):
+    """Pool initializer: send records of a worker process to the parent."""
+    logger.handlers = [logging.handlers.QueueHandler(q)]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def get_queue():
+    ensure()
+    return log_queue
+
+
+def ensure():
+    if listener is None:
+        setup()
+
+
+def fields(**kargs):
+    """`extra` argument with structured fields."""
+    return dict(fields=kargs)
+
+
+class Log(object):
+    """`logger` configured on first use."""
+    def __getattr__(self, name):
+        ensure()
+        return getattr(logger, name)
+
+
+log = Log()
+
+atexit.register(shutdown)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+from .utils import get_rss
+
+
+class MemoryBudget(object):
+    """Keeps RSS below `limit` (MB) by shrinking the chunk size under pressure.
+    Without a limit every method is a no-op.
+    """
+    def __init__(self, limit=None, threshold=0.8, min_rows=100):
+        self.limit     = int(limit) * 1024 * 1024 if limit else None
+        self.threshold = threshold
+        self.min_rows  = min_rows
+
+        self.size = None
+        self.triggered = 0
+        self.min_chunk_rows = None
+        self.peak_rss = 0
+
+    def __bool__(self):
+        return bool(self.limit)
+
+    def pressure(self):
+        if not self.limit:
+            return 0
+
+        rss = get_rss()
+        if rss is None:
+            return 0
+
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss / self.limit
+
+    def chunk_size(self, chunk_rows):
+        """Return the number of rows for the next chunk.
+        Halves it while RSS is above the threshold and slowly restores it
+        once the pressure goes away.
+        """
+        if not self.limit:
+            return chunk_rows
+
+        size = self.size or chunk_rows
+        pressure = self.pressure()
+
+        if pressure >= self.threshold:
+            size = max(min(self.min_rows, chunk_rows), size // 2)
+            self.triggered += 1
+            self.min_chunk_rows = min(self.min_chunk_rows or size, size)
+
+        elif pressure < self.threshold / 2:
+            size = min(chunk_rows, size * 2)
+
+        self.size = size
+        return size
+
+    def exceeded(self):
+        return self.pressure() >= 1
+
+    def allows(self, estimate):
+        """Check whether `estimate` more bytes fit into the budget,
+        used before starting parallel work.
+        """
+        if not self.limit:
+            return True
+
+        rss = get_rss()
+        if rss is None:
+            return True
+
+        return rss + estimate <= self.limit * self.threshold
+
+    def summary(self):
+        return dict(
+            limit = self.limit,
+            triggered = self.triggered,
+            min_chunk_rows = self.min_chunk_rows,
+            peak_rss = self.peak_rss
+        )
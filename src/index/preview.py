@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Preview of files before indexing: sheet names, dimensions and the first
+`rows` rows of every sheet, read through the parser with `max_row` pushed
+down to the readers (the rest of a sheet is not parsed).
+
+Nothing is registered in `_files`/`_tasks`/`_runs` and no records are
+written (file records of readers go to `messages` of the report), the
+report goes to the `preview_cname` collection (default `_preview`) or to
+a JSON lines file.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+from .log import log
+from .timer import Timer
+from .tracer import span
+
+
+def main_preview(filename, db, parser, parser_options, rows=10, report=None):
+    """Preview a file or every file of a directory."""
+    cname = parser_options.get('preview_cname', '_preview')
+
+    options = get_options(parser_options, rows)
+
+    if os.path.isfile(filename):
+        filenames = [filename]
+    else:
+        filenames = (os.path.join(root, name)
+                     for root, dirs, files in os.walk(filename)
+                     for name in files)
+
+    out = None
+    if report:
+        out = sys.stdout if report == '-' else open(report, 'w', encoding='utf-8')
+
+    count = 0
+    try:
+        with Timer("[ main_preview ] finished", db.verbose) as t, \
+             span("main_preview", filename=filename):
+            for filename in filenames:
+                for doc in preview_file(filename, db, parser, options, rows):
+                    if out:
+                        out.write(json.dumps(doc, default=str, ensure_ascii=False) + '\n')
+                    else:
+                        db[cname].insert_one(doc)
+
+                    count += 1
+
+    finally:
+        if out and out is not sys.stdout:
+            out.close()
+
+    log.info(f"Previewed: {count} file(s)")
+
+
+def get_options(parser_options, rows):
+    """Parser options reading the first `rows` rows of the projection."""
+    options = dict(parser_options, preview=rows)
+
+    max_row = int(parser_options.get('min_row') or 1) + rows - 1
+    if parser_options.get('max_row'):
+        max_row = min(max_row, int(parser_options['max_row']))
+
+    options['max_row'] = max_row
+
+    # The sample is small, workers would only add start-up time
+    options.pop('parallel', None)
+
+    return options
+
+
+def preview_file(filename, db, parser, options, rows=10):
+    """Yield a report document for the file (or every archive item)."""
+    from . import yield_file
+
+    dirname = os.path.dirname(os.path.abspath(filename))
+
+    for filename, localname, source in yield_file(filename):
+        db.current_file = None
+        db.checkpoint = None
+        db.memory_budget = None
+        db.sheets = []
+        db.messages = []
+
+        doc = dict(
+            name = filename if source else os.path.basename(filename),
+            dirname = dirname,
+            source = ' => '.join(source) if source else None,
+            size = os.path.getsize(localname)
+        )
+
+        samples = {}
+        with Timer(f"[ preview ] {doc['name']}", db.debug) as t, \
+             span("preview_file", name=doc['name']):
+            try:
+                for records in parser.main(localname, db, options):
+                    if isinstance(records, tuple):
+                        records, extra = records
+                        records = [ dict(record, **extra) for record in records ]
+
+                    for record in records:
+                        sample = samples.setdefault(record.get('_shid'), [])
+                        if len(sample) < rows:
+                            sample.append({k: v for k, v in record.items() if k != '_shid'})
+
+            except Exception as ex:
+                doc['error'] = dict(type=type(ex).__name__, message=str(ex))
+
+        sheets, messages = db.sheets, db.messages
+        db.sheets = db.messages = None
+
+        # Sheets reported by readers and sheets of records (external parsers)
+        known = {sheet['_shid'] for sheet in sheets}
+        sheets += [dict(_shid=shid) for shid in samples if shid not in known]
+
+        for sheet in sheets:
+            sample = samples.get(sheet['_shid'], [])
+            sheet.update(
+                width = max((get_width(record) for record in sample), default=0),
+                sample = sample
+            )
+
+        doc.update(
+            sheets = sheets,
+            messages = messages or None,
+            status = 'error' if 'error' in doc else 'ok' if sheets else 'skipped',
+            elapsed = t.elapsed,
+            created = datetime.utcnow()
+        )
+
+        if db.verbose:
+            log.info(f"Preview: {doc['name']}: {doc['status']}, {len(sheets)} sheet(s)")
+
+        yield {k: v for k, v in doc.items() if v is not None}
+
+
+def get_width(record):
+    """Last column of a sample record."""
+    row = record.get('_row')
+    if isinstance(row, dict):               # row_mode = 3
+        return max((int(col) for col in row), default=0)
+
+    if isinstance(row, list):
+        return len(row)
+
+    cells = record.get('_cells')
+    if isinstance(cells, dict):             # cells_mode = 2
+        cells = [dict(c=col) for col in cells.get('c', [])]
+
+    return max((cell.get('c', 0) for cell in cells or []), default=0)
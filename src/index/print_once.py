@@ -2,14 +2,25 @@
 # coding=utf-8
 # Stan 2025-09-28
 
-messages = []
+from collections import OrderedDict
+
+from .log import log
+
+
+MAX_KEYS = 1024
+
+# Recently reported keys, bounded
+messages = OrderedDict()
 
 def print_once(*args, key=None):
     if not key:
         key = args
 
     if key in messages:
+        messages.move_to_end(key)
         return
 
-    print(*args)
-    messages.append(key)
+    log.warning(' '.join(str(arg) for arg in args))
+    messages[key] = True
+    if len(messages) > MAX_KEYS:
+        messages.popitem(last=False)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Progress of a directory run. The job is sized by the scan (files and
+bytes), counters are updated by the write loop and a background thread
+reports rows/sec, MB/sec and ETA every `progress_interval` seconds:
+a log line in verbose mode and the `progress` field of the task document.
+Files which are not parsed (resumed, duplicates, cached) are counted
+apart and left out of the rates.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from timeit import default_timer
+
+from .log import log, fields
+
+
+class Progress(object):
+    def __init__(self, db, files=0, size=0, interval=10):
+        self.db = db
+        self.files = files
+        self.size = size                    # bytes
+        self.interval = interval            # seconds
+
+        self.files_done = 0
+        self.size_done = 0
+        self.files_skipped = 0
+        self.size_skipped = 0
+        self.rows = 0
+        self.current = None
+        self.parsed = False
+
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start = default_timer()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop.set()
+        self.thread.join()
+        self.report()
+
+    def start_file(self, name):
+        with self.lock:
+            self.current = name
+            self.parsed = False
+
+    def start_parse(self):
+        """The current file (or an archive item) is parsed, not skipped."""
+        self.parsed = True
+
+    def add_rows(self, count):
+        with self.lock:
+            self.rows += count
+
+    def finish_file(self, size):
+        with self.lock:
+            self.files_done += 1
+            self.size_done += size
+            if not self.parsed:
+                self.files_skipped += 1
+                self.size_skipped += size
+
+            self.current = None
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = default_timer() - self.start
+            doc = dict(
+                files = self.files,
+                files_done = self.files_done,
+                size = self.size,
+                size_done = self.size_done,
+                files_skipped = self.files_skipped,
+                size_skipped = self.size_skipped,
+                rows = self.rows,
+                current = self.current,
+            )
+
+        parsed = doc['size_done'] - doc['size_skipped']
+
+        doc.update(
+            elapsed = round(elapsed, 1),
+            rows_per_sec = round(doc['rows'] / elapsed, 1) if elapsed else 0,
+            mb_per_sec = round(parsed / elapsed / (1 << 20), 2) if elapsed else 0,
+            eta = None,
+            updated = datetime.utcnow()
+        )
+
+        # Bytes are a steadier measure of the rest of the job than rows
+        if doc['size'] <= doc['size_done']:
+            doc['eta'] = 0
+        elif parsed:
+            doc['eta'] = round((doc['size'] - doc['size_done']) * elapsed / parsed)
+
+        return doc
+
+    def report(self):
+        doc = self.snapshot()
+
+        if self.db.verbose:
+            percent = doc['size_done'] * 100 / doc['size'] if doc['size'] else 100
+            eta = '?' if doc['eta'] is None else timedelta(seconds=doc['eta'])
+            log.info(f"Progress: {doc['files_done']}/{doc['files']} files ({doc['files_skipped']} skipped), "
+                     f"{doc['size_done'] / (1 << 20):.1f}/{doc['size'] / (1 << 20):.1f} MB ({percent:.0f}%), "
+                     f"{doc['rows_per_sec']:.0f} rows/sec, {doc['mb_per_sec']:.2f} MB/sec, ETA {eta}",
+                     extra=fields(progress={k: v for k, v in doc.items() if k != 'updated'}))
+
+        try:
+            self.db.set_task_progress(doc)
+
+        except Exception as ex:
+            log.warning(f"Progress not saved: {ex}")
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            self.report()
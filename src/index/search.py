@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Inverted value index and lookups ("which files and sheets contain X").
+
+With `search_index` set in parser.cfg, every written record adds
+`{v, c, _fid, _shid, _r}` documents to the `search_cname` collection
+(default `_values`), one per distinct value of `_row`/`_cells`/`_fields`:
+
+search_index = 1: whole cell values
+search_index = 2: also words of multi-word strings
+
+Strings are stored whitespace-collapsed and casefolded.
+"""
+
+import re
+from datetime import datetime
+
+from bson import ObjectId
+
+from .db import Db
+from .tracer import span
+
+
+MAX_LEN = 256           # keeps index keys small, longer values match by prefix
+
+WORD_RE = re.compile(r"\w{2,}")
+
+SEARCH_FIELDS = ['_row', '_cells', '_fields']
+
+# Value collections with ensured indexes
+ensured = set()
+
+
+def index_records(db, cname, records, options={}):
+    """Add values of written `records` of collection `cname` to the index."""
+    search_index = int(options.get('search_index', 1))
+    search_cname = options.get('search_cname', '_values')
+    fields = options.get('search_fields', SEARCH_FIELDS)
+
+    # Fields given without {{ LIST }}
+    if isinstance(fields, str):
+        fields = [ field.strip() for field in fields.split(',') ]
+
+    collection = db.data(search_cname)
+    if search_cname not in ensured:
+        collection.create_index([('v', 1), ('c', 1)])
+        collection.create_index([('_fid', 1)])
+        ensured.add(search_cname)
+
+    docs = []
+    for record in records:
+        for value in get_tokens(record, fields, search_index):
+            docs.append(dict(
+                v = value,
+                c = cname,
+                _fid = db.current_file,
+                _shid = record.get('_shid'),
+                _r = record.get('_r')
+            ))
+
+    if docs:
+        with span("index_values", values=len(docs)):
+            collection.insert_many(docs, ordered=False)
+
+    return len(docs)
+
+
+def drop_file(db, cname, options={}):
+    """Remove values of the current file before it is indexed again."""
+    search_cname = options.get('search_cname', '_values')
+
+    return db.data(search_cname).delete_many({'_fid': db.current_file, 'c': cname})
+
+
+def drop_uncommitted(db, cname, options={}):
+    """Remove values of rows written after the checkpoint of a resumed file."""
+    search_cname = options.get('search_cname', '_values')
+
+    return db.delete_uncommitted(db.data(search_cname), c=cname)
+
+
+def drop_stale(db, cnames, before, options={}):
+    """Remove values of rebuilt collections written before `before`."""
+    search_cname = options.get('search_cname', '_values')
+
+    db[search_cname].delete_many({
+        'c': {'$in': list(cnames)},
+        '_id': {'$lt': ObjectId.from_datetime(before)}
+    })
+
+
+def get_tokens(record, fields=SEARCH_FIELDS, search_index=1):
+    tokens = {}
+    for value in iter_values(record, fields):
+        value = normalize(value)
+        if value is None:
+            continue
+
+        tokens[(type(value), value)] = value
+
+        if search_index == 2 and isinstance(value, str):
+            words = WORD_RE.findall(value)
+            if len(words) > 1:
+                for word in words:
+                    tokens[(str, word)] = word
+
+    return tokens.values()
+
+
+def iter_values(record, fields=SEARCH_FIELDS):
+    for key in fields:
+        value = record.get(key)
+        if not value:
+            continue
+
+        if key == '_cells':
+            if isinstance(value, dict):     # cells_mode = 2
+                yield from value.get('v', [])
+            else:
+                for cell in value:
+                    yield cell.get('v')
+
+        elif isinstance(value, dict):       # row_mode = 3, _fields
+            yield from value.values()
+
+        elif isinstance(value, list):
+            yield from value
+
+        else:
+            yield value
+
+
+def normalize(value):
+    if isinstance(value, str):
+        value = ' '.join(value.split()).casefold()
+        return value[:MAX_LEN] or None
+
+    if isinstance(value, (bool, int, float, datetime)):
+        return value
+
+
+def get_candidates(value):
+    """A query string may also mean a number or a date."""
+    if not isinstance(value, str):
+        return [value]
+
+    candidates = [normalize(value)]
+    text = value.strip()
+    for cast in (int, float, parse_date):
+        try:
+            candidates.append(cast(text))
+            break
+        except ValueError:
+            pass
+
+    return candidates
+
+
+def parse_date(value):
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+
+    raise ValueError(value)
+
+
+def search(value, db=None, cname=None, prefix=False, limit=100, scan=False,
+           search_cname='_values', **kargs):
+    """Return `[{_fid, name, dirname, source, _shid, rows, count}]`
+    for files and sheets containing `value`.
+    """
+    if db is None:
+        db = Db(**kargs)
+
+    cname = cname or db.cname
+
+    if scan:
+        groups = scan_collection(db, cname, value, limit)
+
+    else:
+        if prefix:
+            cond = {'$regex': f"^{re.escape(normalize(str(value)) or '')}"}
+        else:
+            cond = {'$in': get_candidates(value)}
+
+        with span("search", value=value):
+            groups = list(db[search_cname].aggregate([
+                {'$match': {'v': cond, 'c': cname}},
+                {'$group': {
+                    '_id': {'_fid': '$_fid', '_shid': '$_shid'},
+                    'rows': {'$addToSet': '$_r'},
+                    'count': {'$sum': 1}
+                }},
+                {'$sort': {'_id._fid': 1, '_id._shid': 1}},
+                {'$limit': limit}
+            ]))
+
+    return resolve_files(db, groups)
+
+
+def scan_collection(db, cname, value, limit=100):
+    """Full scan over `_row`/`_cells` (exact values), for data indexed
+    without `search_index`.
+    """
+    values = [value] if not isinstance(value, str) else \
+             [value, value.strip()] + get_candidates(value)[1:]
+
+    with span("search_scan", value=value):
+        return list(db[cname].aggregate([
+            {'$match': {'$or': [
+                {'_row': {'$in': values}},
+                {'_cells.v': {'$in': values}},
+            ]}},
+            {'$group': {
+                '_id': {'_fid': '$_fid', '_shid': '$_shid'},
+                'rows': {'$addToSet': '$_r'},
+                'count': {'$sum': 1}
+            }},
+            {'$sort': {'_id._fid': 1, '_id._shid': 1}},
+            {'$limit': limit}
+        ]))
+
+
+def resolve_files(db, groups):
+    fids = list({group['_id']['_fid'] for group in groups})
+    files = {doc['_id']: doc for doc in db[db.cname_files].find(
+        {'_id': {'$in': fids}},
+        {'name': 1, 'dirname': 1, 'source': 1}
+    )}
+
+    # Identical files linked by dedup
+    copies = {}
+    for doc in db[db.cname_files].find(
+        {'same_as': {'$in': fids}},
+        {'name': 1, 'dirname': 1, 'source': 1, 'same_as': 1}
+    ):
+        copies.setdefault(doc['same_as'], []).append(get_path(doc))
+
+    results = []
+    for group in groups:
+        fid = group['_id']['_fid']
+        doc = files.get(fid, {})
+        results.append(dict(
+            _fid = fid,
+            name = doc.get('name'),
+            dirname = doc.get('dirname'),
+            source = doc.get('source'),
+            _shid = group['_id']['_shid'],
+            rows = sorted(r for r in group['rows'] if r is not None),
+            count = group['count'],
+            copies = copies.get(fid, [])
+        ))
+
+    return results
+
+
+def get_path(doc):
+    path = '/'.join(x for x in (doc.get('dirname'), doc.get('source')) if x)
+    return f"{path} => {doc.get('name')}" if doc.get('source') else f"{path}/{doc.get('name')}"
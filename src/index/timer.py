@@ -4,6 +4,8 @@
 
 from timeit import default_timer
 
+from .log import log, fields
+
 
 class Timer(object):
     def __init__(self, description="Elapsed time", verbose=True):
@@ -19,7 +21,8 @@ class Timer(object):
         end = self.timer()
         self.elapsed = end - self.start
         if self.verbose:
-            print(f"{self.description}: {self.elapsed:.2f} sec")
+            log.info(f"{self.description}: {self.elapsed:.2f} sec",
+                     extra=fields(timer=self.description, elapsed=self.elapsed))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Opt-in tracer writing nested spans in Chrome Trace Event format.
+The resulting file can be loaded in chrome://tracing or ui.perfetto.dev.
+
+Events are written to the file as they end (JSON array format), so a long
+run keeps none of them in memory and an interrupted trace still loads.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class Tracer(object):
+    def __init__(self):
+        self.enabled = False
+        self.file = None
+        self.pid = None
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def enable(self, filename):
+        self.file = open(filename, 'w', encoding="utf8")
+        self.file.write("[")
+        self.pid = os.getpid()
+        self.count = 0
+        self.enabled = True
+
+    @contextmanager
+    def span(self, title, cat="index", **args):
+        if not self.enabled:
+            yield
+            return
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_event(self.event(title, start, perf_counter(), cat, **args))
+
+    def event(self, title, start, end, cat="index", **args):
+        """Complete event of `perf_counter()` times, worker processes
+        return them to the parent for `extend`.
+        """
+        return dict(
+            name = title,
+            cat  = cat,
+            ph   = "X",
+            ts   = start * 1e6,     # microseconds, system-wide monotonic
+            dur  = (end - start) * 1e6,
+            pid  = os.getpid(),
+            tid  = threading.get_ident(),
+            args = args
+        )
+
+    def traced(self, it, title, cat="index", **args):
+        """Record every `next()` call of an iterator as a span."""
+        if not self.enabled:
+            return it
+
+        return self._traced(iter(it), title, cat, args)
+
+    def _traced(self, it, title, cat, args):
+        while True:
+            with self.span(title, cat, **args):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+
+            yield item
+
+    def add_event(self, event):
+        self.extend([event])
+
+    def extend(self, events):
+        """Write events, also the ones collected in another process."""
+        with self.lock:
+            # Forked workers inherit the file, events are written by the parent
+            if not self.file or os.getpid() != self.pid:
+                return
+
+            for event in events:
+                self.file.write(",\n" if self.count else "\n")
+                self.file.write(json.dumps(event, default=str))
+                self.count += 1
+
+    def close(self):
+        """Finish the trace file, returns the number of events."""
+        with self.lock:
+            self.enabled = False
+            if self.file:
+                self.file.write("\n]\n")
+                self.file.close()
+                self.file = None
+
+            return self.count
+
+
+tracer = Tracer()
+span   = tracer.span
+traced = tracer.traced
@@ -2,7 +2,11 @@
 # coding=utf-8
 # Stan 2025-10-05
 
+import hashlib
+import io
 import os
+import shutil
+import tempfile
 from datetime import datetime
 
 try:
@@ -31,6 +35,44 @@ def get_file_info(filename):
         return {}
 
 
+def get_file_hash(filename, block_size=1 << 20):
+    """sha256 of the file content (path or seekable file object), read in blocks."""
+    h = hashlib.sha256()
+    if not isinstance(filename, str):
+        filename.seek(0)
+        for block in iter(lambda: filename.read(block_size), b''):
+            h.update(block)
+
+        return h.hexdigest()
+
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def get_seekable(data, spool_size=64 << 20):
+    """Seekable file object of bytes or a stream. Streams (stdin, sockets)
+    are copied into a buffer which goes to disk above `spool_size` bytes.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(data)
+
+    if skip_exc(lambda: data.seekable(), False):
+        return data
+
+    return spool(data, spool_size)
+
+
+def spool(src, spool_size=64 << 20):
+    buffer = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    shutil.copyfileobj(src, buffer, 1 << 20)
+    buffer.seek(0)
+
+    return buffer
+
+
 def get_memory_info():
     if process:
         return skip_exc(lambda: process.memory_info()._asdict())
@@ -38,6 +80,20 @@ def get_memory_info():
         return "`psutil` must be installed"
 
 
+def get_rss():
+    """Resident set size of the current process in bytes (or None)."""
+    if process:
+        return skip_exc(lambda: process.memory_info().rss)
+
+    # Linux fallback without `psutil`
+    return skip_exc(get_statm_rss)
+
+
+def get_statm_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
 def skip_exc(func, default=None):
     try:
         return func()
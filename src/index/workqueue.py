@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Stan 2026-10-19
+
+"""Queue of files shared by several hosts indexing one directory.
+
+The coordinator enqueues paths (relative to the directory) for a task,
+workers claim them with a lease, extend it with a heartbeat while parsing
+and mark them `completed` or `failed`. Files of a worker which stopped
+sending heartbeats are claimed again after the lease expires, up to
+`max_attempts` times, then they are marked `failed`. A worker whose lease
+is lost or has run out stops writing the file (`LeaseLost`).
+"""
+
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pymongo
+from pymongo import ReturnDocument
+
+from .log import log
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Lease(object):
+    """Lease of a claimed file, checked before each write."""
+    def __init__(self, item):
+        self.item = item
+        self.until = item['lease_until']
+        self.lost = threading.Event()
+
+    def check(self):
+        # The file may be claimed by another worker once the lease runs out
+        if self.lost.is_set() or datetime.utcnow() >= self.until:
+            raise LeaseLost(f"Lease lost: '{self.item['path']}'")
+
+
+class WorkQueue(object):
+    def __init__(self, db, cname='_queue', lease=60, max_attempts=3, poll=5):
+        self.db = db
+        self.collection = db[cname]
+        self.lease = lease                  # seconds
+        self.max_attempts = max_attempts
+        self.poll = poll                    # seconds between claims when idle
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.collection.create_index([('_tid', 1), ('path', 1)], unique=True)
+        self.collection.create_index([('_tid', 1), ('status', 1)])
+
+    def enqueue(self, paths, dirname=None):
+        """Add files to the task queue, files already queued are kept as is."""
+        now = datetime.utcnow()
+
+        requests = [ pymongo.UpdateOne(
+            filter = { "_tid": self.db.current_task, "path": path },
+            update = {
+                "$setOnInsert": {
+                    "status": "queued",
+                    "dirname": dirname,
+                    "attempts": 0,
+                    "created": now,
+                },
+            },
+            upsert = True
+        ) for path in paths ]
+
+        if not requests:
+            return 0
+
+        res = self.collection.bulk_write(requests, ordered=False)
+        return res.upserted_count
+
+    def expire(self):
+        """Mark files with an expired lease and no attempts left as failed."""
+        now = datetime.utcnow()
+
+        res = self.collection.update_many(
+            filter = {
+                "_tid": self.db.current_task,
+                "status": "running",
+                "lease_until": { "$lt": now },
+                "attempts": { "$gte": self.max_attempts },
+            },
+            update = {
+                "$set": {
+                    "status": "failed",
+                    "error": "lease expired",
+                    "finished": now,
+                },
+                "$unset": { "lease_until": "" },
+            }
+        )
+        if res.modified_count:
+            log.warning(f"Failed after {self.max_attempts} attempts: {res.modified_count} file(s)")
+
+        return res.modified_count
+
+    def claim(self):
+        """Take a queued file or a file with an expired lease."""
+        self.expire()
+
+        now = datetime.utcnow()
+
+        return self.collection.find_one_and_update(
+            filter = {
+                "_tid": self.db.current_task,
+                "$or": [
+                    { "status": "queued" },
+                    {
+                        "status": "running",
+                        "lease_until": { "$lt": now },
+                        "attempts": { "$lt": self.max_attempts },
+                    },
+                ],
+            },
+            update = {
+                "$set": {
+                    "status": "running",
+                    "worker": self.worker,
+                    "lease_until": now + timedelta(seconds=self.lease),
+                    "started": now,
+                },
+                "$inc": { "attempts": 1 },
+            },
+            sort = [("_id", 1)],
+            return_document = ReturnDocument.AFTER
+        )
+
+    def claims(self):
+        """Yield claimed files until the queue is drained."""
+        while True:
+            item = self.claim()
+            if item:
+                yield item
+                continue
+
+            # Leases of other workers may still expire
+            if not self.pending():
+                return
+
+            time.sleep(self.poll)
+
+    def pending(self):
+        return self.collection.count_documents({
+            "_tid": self.db.current_task,
+            "$or": [
+                { "status": "queued" },
+                {
+                    "status": "running",
+                    "attempts": { "$lt": self.max_attempts },
+                },
+            ],
+        }, limit=1)
+
+    @contextmanager
+    def leased(self, item):
+        """Extend the lease of `item` in a background thread, yield `Lease`."""
+        lease = Lease(item)
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.lease / 3):
+                until = datetime.utcnow() + timedelta(seconds=self.lease)
+                res = self.collection.update_one(
+                    filter = { "_id": item['_id'], "worker": self.worker },
+                    update = { "$set": { "lease_until": until } }
+                )
+                if not res.matched_count:
+                    log.warning(f"Lease lost: '{item['path']}'")
+                    lease.lost.set()
+                    return
+
+                lease.until = until
+
+        thread = threading.Thread(target=heartbeat, daemon=True)
+        thread.start()
+        try:
+            yield lease
+
+        finally:
+            stop.set()
+            thread.join()
+
+    def finish(self, item, status, **kargs):
+        now = datetime.utcnow()
+
+        return self.collection.update_one(
+            filter = { "_id": item['_id'], "worker": self.worker },
+            update = {
+                "$set": dict(
+                    status = status,
+                    finished = now,
+                    ** kargs
+                ),
+                "$unset": { "lease_until": "" },
+            }
+        )
+
+    def status(self):
+        """Number of files by status for the current task."""
+        self.expire()
+
+        res = self.collection.aggregate([
+            { "$match": { "_tid": self.db.current_task } },
+            { "$group": { "_id": "$status", "count": { "$sum": 1 } } },
+        ])
+
+        return { doc['_id']: doc['count'] for doc in res }
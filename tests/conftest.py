@@ -0,0 +1,51 @@
+import pytest
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Shared in-memory client for all `Db` instances of the test."""
+    mongomock = pytest.importorskip("mongomock")
+
+    import index.db
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(index.db.pymongo, "MongoClient", lambda *args, **kargs: client)
+
+    # mongomock does not accept `sort` of `UpdateOne` (MongoDB 8.0)
+    builder = mongomock.collection.BulkOperationBuilder
+    add_update = builder.add_update
+    monkeypatch.setattr(builder, "add_update",
+                        lambda self, *args, sort=None, **kargs: add_update(self, *args, **kargs))
+
+    return client
+
+
+class ReaderDb(object):
+    """Reader side of `Db` for a file parsed from the start."""
+    verbose = False
+    memory_budget = None
+    checkpoint = None
+
+    def __init__(self):
+        self.records = []
+
+    def committed_rows(self, shid):
+        return 0
+
+    def push_sheet_info(self, *args, **kargs):
+        pass
+
+    def push_file_record(self, action, **kargs):
+        self.records.append(dict(kargs, action=action))
+
+
+@pytest.fixture
+def read():
+    """Records of a file parsed by the default parser."""
+    from index.index_001 import main
+
+    def read(path, options={}, db=None):
+        db = db or ReaderDb()
+        return [record for records in main(str(path), db, options) for record in records]
+
+    return read
@@ -0,0 +1,68 @@
+import pytest
+
+from index.index_001.funcs import Projection
+from index.index_001.funcs import expand_cells
+from index.index_001.funcs import expand_row
+from index.index_001.funcs import is_empty_record
+from index.index_001.funcs import pack_cells
+from index.index_001.funcs import pack_row
+
+
+def test_projection_options_from_config():
+    proj = Projection({'min_row': '3', 'max_row': '5', 'columns': 'B,D:E'})
+
+    assert (proj.min_row, proj.max_row) == (3, 5)
+    assert list(proj.row_range(10)) == [2, 3, 4]
+    assert proj.pick(['a', 'b', 'c', 'd', 'e', 'f']) == ['b', 'd', 'e']
+    assert proj.after(5) and not proj.after(4)
+
+
+def test_projection_defaults():
+    proj = Projection()
+
+    assert (proj.min_row, proj.max_row) == (1, None)
+    assert list(proj.row_range(3)) == [0, 1, 2]
+    assert proj.pick(['a', 'b']) == ['a', 'b']
+
+
+@pytest.mark.parametrize('row_mode', [1, 2, 3])
+def test_pack_row_round_trip(row_mode):
+    values = ['a', None, 0, '', None, None]
+
+    packed = pack_row(values, row_mode)
+
+    assert expand_row(packed, len(values)) == values
+    assert pack_row([], row_mode) == []
+
+
+def test_pack_row():
+    assert pack_row(['a', None, 3, None], 2) == ['a', None, 3]
+    assert pack_row(['a', None, 3, None], 3) == {'1': 'a', '3': 3}
+
+    with pytest.raises(ValueError):
+        pack_row(['a'], '3')
+
+
+def test_pack_cells_round_trip():
+    cells = [
+        {'c': 1, 'v': 'a', 't': 1},
+        {'c': 2, 'v': 5, 't': 2, '_n': {'text': 'note'}},
+        {'c': 4, '_n': {'text': 'empty cell'}},
+    ]
+
+    packed = pack_cells(cells)
+
+    assert packed == {
+        'c': [1, 2], 'v': ['a', 5], 't': [1, 2],
+        'n': [{'text': 'note', 'c': 2}, {'text': 'empty cell', 'c': 4}],
+    }
+    assert expand_cells(packed) == cells
+    assert expand_cells(pack_cells([{'c': 3, 'v': 'x'}])) == [{'c': 3, 'v': 'x'}]
+    assert pack_cells([]) is None
+
+
+def test_is_empty_record():
+    assert is_empty_record({'_row': [None, '']})
+    assert is_empty_record({'_row': {}, '_cells': {'c': [1], 'v': ['']}})
+    assert not is_empty_record({'_row': [None, 0]})
+    assert not is_empty_record({'_cells': [{'c': 1, '_n': {'text': 'x'}}]})
@@ -0,0 +1,49 @@
+from bson import ObjectId
+
+import index
+from index.db import Db
+
+
+def scan(client, tmp_path, lines):
+    (tmp_path / "parser.cfg").write_text("[DEFAULT]\nupsert_mode = 1\n")
+    path = tmp_path / "a.csv"
+    path.write_text("".join(line + "\n" for line in lines))
+
+    index.main(filename=str(path))
+
+    return {(d['_row'][0], d['_r']): d for d in client['db1']['dump'].find()}
+
+
+def test_deleted_rows(client, tmp_path):
+    rows = scan(client, tmp_path, ["a,1", "b,2", "c,3"])
+    assert [len(d['_gen']) for d in rows.values()] == [1, 1, 1]
+    assert not any('_deleted' in d for d in rows.values())
+
+    # `_r` is a part of the keys, c moves up and is a new row
+    rows = scan(client, tmp_path, ["a,1", "c,3"])
+    assert sorted(k for k, d in rows.items() if '_deleted' in d) == [('b', 2), ('c', 3)]
+    assert rows[('a', 1)]['_gen'][0]['g'] == 2
+    assert rows[('c', 2)]['_gen'] == rows[('a', 1)]['_gen']
+
+    # Seen again (removing the mark needs `$let`, not evaluated by mongomock)
+    rows = scan(client, tmp_path, ["a,1", "b,2", "c,3"])
+    assert rows[('b', 2)]['_gen'] == [{'k': rows[('a', 1)]['_gen'][0]['k'], 'g': 3}]
+    assert rows[('c', 2)]['_gen'][0]['g'] == 2
+
+
+def test_post_handle_of_other_scans(client):
+    db = Db()
+    db.current_task, db.current_file, db.generation = 't1', ObjectId(), 2
+    key = db.scan_key()
+
+    dump = client['db1']['dump']
+    dump.insert_many([
+        {'n': 1, '_gen': [{'k': key, 'g': 2}]},                         # seen
+        {'n': 2, '_gen': [{'k': key, 'g': 1}]},                         # missing
+        {'n': 3, '_gen': [{'k': key, 'g': 1}], '_deleted': [{'k': key}]},
+        {'n': 4, '_gen': [{'k': 'other', 'g': 1}, {'k': key, 'g': 2}]},
+        {'n': 5, '_gen': [{'k': 'other', 'g': 1}]},                     # another task
+    ])
+
+    assert db.upsert_post_handle(dump) == 1
+    assert [d['n'] for d in dump.find({'_deleted.k': key})] == [2, 3]
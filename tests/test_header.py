@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from index.index_001.header import cast, detect_header, infer_types, normalize_names
+
+
+def test_header_from_config(read, tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("title\nName,Code,Qty\na,007,1\nb,010,2.5\n")
+
+    records = read(path, {'header_mode': '2', 'header_row': '2', 'header_sample': '10'})
+
+    assert records[0] == {'_row': ['title'], '_shid': 1, '_r': 1}
+    assert records[1]['_r'] == 2 and '_fields' not in records[1]
+    assert [r['_fields'] for r in records[2:]] == [
+        {'name': 'a', 'code': '007', 'qty': 1.0},
+        {'name': 'b', 'code': '010', 'qty': 2.5},
+    ]
+    assert all('_row' not in r for r in records[2:])
+
+
+def test_header_names_from_config(read, tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("1,2\n3,4,5\n")
+
+    records = read(path, {'header_mode': '1', 'header': 'First, Second'})
+
+    # Cells beyond the header are named, not typed
+    assert [r['_fields'] for r in records] == [
+        {'first': 1, 'second': 2},
+        {'first': 3, 'second': 4, 'col3': '5'},
+    ]
+
+
+def test_header_mode_off(read, tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("a,b\n1,2\n")
+
+    assert all('_fields' not in r for r in read(path, {'header_mode': '0'}))
+
+
+def test_detect_header():
+    rows = [(1, ['Report', None, None]), (2, ['a', 'b', 'c']), (3, [1, 2, 3])]
+    assert detect_header(rows) == 2
+    assert detect_header([(1, [1, 2]), (2, [3, 4])]) is None
+
+
+def test_infer_types():
+    rows = [[1, '2', 'x', datetime(2024, 1, 1), None], [2.0, '2.5', 3, datetime(2024, 1, 2), None]]
+    assert infer_types(rows, 5) == ['int', 'float', 'str', 'date', None]
+
+
+def test_cast_keeps_values_which_do_not_fit():
+    assert cast('12', 'int') == 12
+    assert cast('n/a', 'int') == 'n/a'
+    assert cast(2.5, 'int') == 2.5
+    assert cast('007', 'int') == '007'
+
+
+def test_normalize_names():
+    assert normalize_names(['Name', 'name', None, '1st', 'Qty, pcs']) == \
+        ['name', 'name_2', 'col3', 'c1st', 'qty_pcs']
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from index.db import Db
+
+
+def old_history(client):
+    """A task and a file with `records` written before the run log."""
+    db = client['db1']
+    tid = ObjectId()
+    db['_tasks'].insert_one({
+        '_id': tid,
+        'records': [{'action': 'connection', 'created': datetime(2020, 1, 1)}]
+    })
+    fid = db['_files'].insert_one({
+        'name': 'old.xlsx',
+        'records': [
+            {'action': 'started', '_tid': tid, 'created': datetime(2020, 1, 1, 1)},
+            {'action': 'completed', '_tid': tid, 'total': 5, '__consumption': [1, 2],
+             'created': datetime(2020, 1, 1, 2)},
+        ]
+    }).inserted_id
+
+    return tid, fid
+
+
+def test_migrate_history(client):
+    tid, fid = old_history(client)
+    db = Db()
+
+    assert db.migrate_history() == 3
+    assert db.migrate_history() == 0
+
+    runs = client['db1']['_runs']
+    assert runs.count_documents({'_fid': fid}) == 2
+    assert runs.count_documents({'_tid': tid, '_fid': {'$exists': False}}) == 1
+
+    doc = client['db1']['_files'].find_one({'_id': fid})
+    assert [r['action'] for r in doc['records']] == ['started', 'completed']
+    assert '__consumption' not in doc['records'][-1]
+    assert doc['status'][str(tid)]['action'] == 'completed'
+    for r in doc['records']:
+        assert runs.find_one({'_id': r['_run']})
+
+
+def test_migrate_history_interrupted(client, monkeypatch):
+    tid, fid = old_history(client)
+    db = Db()
+
+    def crash(self, *args, **kargs):
+        raise RuntimeError("interrupted")
+
+    # Records of the file moved, the summaries are not saved
+    files = client['db1']['_files']
+    with monkeypatch.context() as m:
+        m.setattr(type(files), 'update_one', crash)
+        with pytest.raises(RuntimeError):
+            db.migrate_history()
+
+    assert db.migrate_history() == 3
+
+    runs = client['db1']['_runs']
+    assert runs.count_documents({'_fid': fid}) == 2
+    assert runs.count_documents({'_tid': tid, '_fid': {'$exists': False}}) == 1
+
+    doc = files.find_one({'_id': fid})
+    for r in doc['records']:
+        assert runs.find_one({'_id': r['_run']})
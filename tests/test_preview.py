@@ -0,0 +1,32 @@
+import pytest
+
+import index
+
+
+# `get_sheet_names` of the xlsx reader
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_preview(client, tmp_path):
+    from openpyxl import Workbook
+
+    (tmp_path / "parser.cfg").write_text(
+        "[DEFAULT]\nrow_mode = 3\nheader_mode = 1\nsheets = {{ LIST }} Sheet, Missing\n")
+
+    book = Workbook()
+    book.active.append(["name", None, "qty"])
+    for i in range(20):
+        book.active.append([f"n{i}", None, i])
+    book.save(tmp_path / "a.xlsx")
+
+    index.main(filename=str(tmp_path), preview=5)
+
+    db = client['db1']
+    assert db['_runs'].count_documents({}) == 0
+    assert db['_files'].count_documents({}) == 0
+
+    doc, = db['_preview'].find({'name': 'a.xlsx'})
+    assert [m['action'] for m in doc['messages']] == ['warning', 'schema']
+    assert doc['messages'][0]['message'] == "Wrong sheet name: Missing"
+
+    sheet, = doc['sheets']
+    assert len(sheet['sample']) == 5
+    assert sheet['width'] == 3
@@ -0,0 +1,119 @@
+import gzip
+from datetime import datetime
+from zipfile import ZipFile
+
+import pytest
+
+from index.index_001.funcs import expand_cells
+
+
+def test_csv_cells_mode_from_config(read, tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("name,value\na,1\n,2\n")
+
+    verbose = read(path, {'cells_mode': '1'})
+    packed = read(path, {'cells_mode': '2'})
+
+    assert packed[2]['_cells'] == {'c': [2], 'v': ['2']}
+    assert [expand_cells(r['_cells']) for r in packed] == [r['_cells'] for r in verbose]
+
+
+def test_csv_delimiter_and_encoding(read, tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes("имя;кол\nИван;1\n\"x;y\";2\n".encode('cp1251'))
+
+    assert [r['_row'] for r in read(path)] == [['имя', 'кол'], ['Иван', '1'], ['x;y', '2']]
+
+
+def test_tsv_gzip_and_large_field(read, tmp_path):
+    path = tmp_path / "a.tsv.gz"
+    big = "x" * 200000
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(f"a,b\tc\n\"{big}\"\t2\n")
+
+    records = read(path)
+
+    assert records[0]['_row'] == ['a,b', 'c']
+    assert records[1]['_row'] == [big, '2']
+    assert [r['_r'] for r in records] == [1, 2]
+
+
+def test_csv_projection(read, tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("".join(f"a{i},b{i},c{i}\n" for i in range(1, 11)))
+
+    records = read(path, {'min_row': 3, 'max_row': 4, 'columns': 'A,C'})
+
+    assert [(r['_r'], r['_row']) for r in records] == [(3, ['a3', 'c3']), (4, ['a4', 'c4'])]
+
+
+def test_row_modes(read, tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("a,,\n")
+
+    assert read(path, {'row_mode': 1})[0]['_row'] == ['a', None, None]
+    assert read(path, {'row_mode': '2'})[0]['_row'] == ['a']
+    assert read(path, {'row_mode': '3'})[0]['_row'] == {'1': 'a'}
+    assert read(path, {'row_mode': 0, 'cells_mode': 1})[0] == \
+        {'_cells': [{'c': 1, 'v': 'a'}], '_shid': 1, '_r': 1}
+
+    with pytest.raises(ValueError):
+        read(path, {'row_mode': 4})
+
+
+ODS_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content
+  xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+  xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+  xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+  xmlns:dc="http://purl.org/dc/elements/1.1/">
+<office:body><office:spreadsheet>
+<table:table table:name="Data">
+<table:table-row>
+  <table:table-cell office:value-type="string"><text:p>a<text:s text:c="2"/>b</text:p></table:table-cell>
+  <table:table-cell office:value-type="float" office:value="3"/>
+  <table:table-cell table:number-columns-repeated="100"/>
+  <table:table-cell office:value-type="date" office:date-value="2024-02-03T10:11:12">
+    <office:annotation><dc:creator>me</dc:creator><text:p>note</text:p></office:annotation>
+  </table:table-cell>
+  <table:table-cell table:number-columns-repeated="16000"/>
+</table:table-row>
+<table:table-row table:number-rows-repeated="1000000"><table:table-cell table:number-columns-repeated="16384"/></table:table-row>
+<table:table-row table:number-rows-repeated="2">
+  <table:table-cell office:value-type="boolean" office:boolean-value="true" table:number-columns-repeated="2"/>
+</table:table-row>
+</table:table>
+<table:table table:name="Empty"/>
+</office:spreadsheet></office:body>
+</office:document-content>
+"""
+
+
+def write_ods(path):
+    with ZipFile(path, 'w') as zf:
+        zf.writestr("mimetype", "application/vnd.oasis.opendocument.spreadsheet")
+        zf.writestr("content.xml", ODS_CONTENT)
+
+
+def test_ods(read, tmp_path):
+    path = tmp_path / "a.ods"
+    write_ods(path)
+
+    records = read(path, {'cells_mode': 1, 'skip_empty_rows': 1})
+
+    assert [r['_r'] for r in records] == [1, 1000002, 1000003]
+    assert records[0]['_row'] == ['a  b', 3.0] + [None] * 100 + [datetime(2024, 2, 3, 10, 11, 12)]
+    assert records[1]['_row'] == [True, True]
+
+    note, = [c for c in records[0]['_cells'] if '_n' in c]
+    assert (note['c'], note['_n']['text']) == (103, 'note')
+
+
+def test_ods_cells_round_trip(read, tmp_path):
+    path = tmp_path / "a.ods"
+    write_ods(path)
+
+    verbose = read(path, {'cells_mode': 1, 'max_row': 1})
+    packed = read(path, {'cells_mode': 2, 'max_row': 1})
+
+    assert [expand_cells(r['_cells']) for r in packed] == [r['_cells'] for r in verbose]
@@ -0,0 +1,31 @@
+import index
+
+
+def write_dir(path, broken=False):
+    path.mkdir()
+    (path / "a.csv").write_text("name,value\na,1\nb,2\n")
+    if broken:
+        (path / "b.xlsx").write_bytes(b"not a workbook")
+
+    return str(path)
+
+
+def test_rebuild(client, tmp_path):
+    dump = client['db1']['dump']
+    dump.insert_one({'old': True})
+
+    index.main(filename=write_dir(tmp_path / "data"), rebuild=True)
+
+    assert dump.count_documents({'old': True}) == 0
+    assert dump.count_documents({}) == 3     # the header row as well
+    assert '_rebuild_dump' not in client['db1'].list_collection_names()
+
+
+def test_rebuild_failed_file(client, tmp_path):
+    dump = client['db1']['dump']
+    dump.insert_one({'old': True})
+
+    index.main(filename=write_dir(tmp_path / "data", broken=True), rebuild=True)
+
+    assert list(dump.find({}, {'_id': 0})) == [{'old': True}]
+    assert '_rebuild_dump' not in client['db1'].list_collection_names()
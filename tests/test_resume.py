@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import index
+from index.db import Db
+
+
+def write_csv(tmp_path, rows=7):
+    (tmp_path / "parser.cfg").write_text("[DEFAULT]\nchunk_rows = {{ INT }} 2\n")
+    path = tmp_path / "a.csv"
+    path.write_text("".join(f"r{i},{i}\n" for i in range(1, rows + 1)))
+
+    return str(path)
+
+
+def interrupt_after(monkeypatch, batches):
+    """The run stops after the records of the batch are written,
+    before its checkpoint is saved.
+    """
+    insert_many = Db.insert_many
+    calls = []
+
+    def interrupted(self, *args, **kargs):
+        res = insert_many(self, *args, **kargs)
+        calls.append(1)
+        if len(calls) == batches:
+            raise KeyboardInterrupt
+
+        return res
+
+    monkeypatch.setattr(Db, "insert_many", interrupted)
+
+
+def test_resume(client, tmp_path, monkeypatch):
+    path = write_csv(tmp_path)
+    dump = client['db1']['dump']
+
+    with monkeypatch.context() as m:
+        interrupt_after(m, 2)
+        with pytest.raises(KeyboardInterrupt):
+            index.main(filename=path)
+
+    assert dump.count_documents({}) == 4
+    checkpoint = client['db1']['_files'].find_one()['checkpoint']
+    assert (checkpoint['_shid'], checkpoint['_r'], checkpoint['chunks']) == (1, 2, 1)
+
+    index.main(filename=path, resume=True)
+
+    assert sorted(d['_r'] for d in dump.find()) == list(range(1, 8))
+    doc = client['db1']['_files'].find_one()
+    assert 'checkpoint' not in doc
+    assert doc['records'][-1]['action'] == 'completed'
+    assert doc['records'][-1]['total'] == 5
+
+    # A completed file is skipped
+    index.main(filename=path, resume=True)
+    assert dump.count_documents({}) == 7
+
+
+def test_delete_uncommitted(client):
+    db = Db()
+    db.current_file = fid = ObjectId()
+    started = datetime.utcnow()
+    db.checkpoint = dict(shids=[1, 2], _shid=2, _r=3, chunks=2, started=started)
+
+    dump = client['db1']['dump']
+    before = ObjectId.from_datetime(started - timedelta(minutes=1))
+    dump.insert_many([
+        {'_fid': fid, '_shid': 1, '_r': 10},            # committed sheet
+        {'_fid': fid, '_shid': 2, '_r': 3},             # committed row
+        {'_fid': fid, '_shid': 2, '_r': 4},
+        {'_fid': fid, '_shid': 3, '_r': 1},
+        {'_id': before, '_fid': fid, '_shid': 2, '_r': 5},   # an earlier run
+        {'_fid': ObjectId(), '_shid': 2, '_r': 4},      # another file
+    ])
+
+    assert db.delete_uncommitted(dump).deleted_count == 2
+    assert sorted((d['_shid'], d['_r']) for d in dump.find({'_fid': fid})) == \
+        [(1, 10), (2, 3), (2, 5)]
+
+    # Extra fields narrow the filter (search values of a collection)
+    values = client['db1']['_values']
+    values.insert_many([{'_fid': fid, '_shid': 2, '_r': 4, 'c': c} for c in ('dump', 'other')])
+    assert db.delete_uncommitted(values, c='dump').deleted_count == 1
+    assert values.find_one()['c'] == 'other'
+
+
+def test_committed_rows(client):
+    db = Db()
+    db.checkpoint = dict(shids=[1, 2], _shid=2, _r=3)
+
+    assert db.committed_rows(1) is None
+    assert db.committed_rows(2) == 3
+    assert db.committed_rows(3) == 0
+    assert db.is_committed({'_shid': 2, '_r': 3})
+    assert not db.is_committed({'_shid': 2, '_r': 4})
+
+
+def test_resume_rebuild(client, tmp_path):
+    with pytest.raises(ValueError):
+        index.main(filename=write_csv(tmp_path), rebuild=True, resume=True)
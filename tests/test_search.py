@@ -0,0 +1,25 @@
+import index
+from index.search import get_tokens
+
+
+def test_get_tokens():
+    record = {'_row': ['Red  Apple', 'Red Apple', 5, None], '_fields': {'n': 'x'}}
+
+    assert sorted(map(str, get_tokens(record))) == ['5', 'red apple', 'x']
+    assert sorted(map(str, get_tokens(record, search_index=2))) == \
+        ['5', 'apple', 'red', 'red apple', 'x']
+
+
+def test_search_index_from_config(client, tmp_path):
+    (tmp_path / "parser.cfg").write_text("[DEFAULT]\nsearch_index = 2\nsearch_fields = _row\n")
+    path = tmp_path / "a.csv"
+    values = client['db1']['_values']
+
+    path.write_text("red apple,1\n")
+    index.main(filename=str(path))
+    assert sorted(d['v'] for d in values.find()) == ['1', 'apple', 'red', 'red apple']
+
+    # A rescanned file replaces its values
+    path.write_text("green pear,1\n")
+    index.main(filename=str(path))
+    assert sorted(d['v'] for d in values.find()) == ['1', 'green', 'green pear', 'pear']
@@ -0,0 +1,14 @@
+import io
+
+import index
+
+
+def test_index_stream(client, tmp_path, monkeypatch):
+    (tmp_path / "parser.cfg").write_text("[DEFAULT]\nspool_size = 0.5\n")
+    monkeypatch.chdir(tmp_path)
+
+    index.index_stream(io.BytesIO(b"a,1\nb,2\n"), "data.csv")
+
+    rows = [d['_row'] for d in client['db1']['dump'].find()]
+    assert rows == [['a', '1'], ['b', '2']]
+    assert client['db1']['_files'].find_one()['name'] == 'data.csv'
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from index.db import Db
+from index.workqueue import LeaseLost, WorkQueue
+
+
+def get_queue(client, lease=60):
+    db = Db()
+    db.current_task = 1
+    queue = WorkQueue(db, lease=lease, max_attempts=2, poll=0)
+    queue.enqueue(['a.csv'], '/data')
+
+    return queue
+
+
+def test_lease_lost_to_another_worker(client):
+    queue = get_queue(client, lease=0.3)
+    item = queue.claim()
+
+    with queue.leased(item) as lease:
+        lease.check()
+
+        queue.collection.update_one({'_id': item['_id']}, {'$set': {'worker': 'other:1'}})
+        assert lease.lost.wait(1)
+        with pytest.raises(LeaseLost):
+            lease.check()
+
+    assert queue.finish(item, 'completed').matched_count == 0
+
+
+def test_lease_run_out(client):
+    queue = get_queue(client)
+    item = queue.claim()
+
+    with queue.leased(item) as lease:
+        lease.until = datetime.utcnow() - timedelta(seconds=1)
+        with pytest.raises(LeaseLost):
+            lease.check()
+
+
+def test_expired_lease_claimed_again(client):
+    queue = get_queue(client)
+    item = queue.claim()
+    assert queue.claim() is None
+
+    queue.collection.update_one({'_id': item['_id']},
+                                {'$set': {'lease_until': datetime.utcnow() - timedelta(seconds=1)}})
+    item = queue.claim()
+    assert item['attempts'] == 2
+
+    queue.collection.update_one({'_id': item['_id']},
+                                {'$set': {'lease_until': datetime.utcnow() - timedelta(seconds=1)}})
+    assert queue.claim() is None
+    assert queue.status() == {'failed': 1}
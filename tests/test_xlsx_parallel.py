@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from index.index_001.xlsx_parallel import BLOCK_SIZE, find_row, split_ranges
+
+
+def write_sheet(path, rows, cell_size, tail=0):
+    """Sheet XML of `rows` rows with a padded inline string each."""
+    with open(path, 'wb') as f:
+        f.write(b'<?xml version="1.0"?><worksheet><sheetData>')
+        for i in range(1, rows + 1):
+            f.write(b'<row r="%d"><c r="A%d" t="inlineStr"><is><t>%s</t></is></c></row>'
+                    % (i, i, b'x' * cell_size))
+        f.write(b'</sheetData>')
+        f.write(b'<pageMargins/>' * tail)
+        f.write(b'</worksheet>')
+
+
+def test_find_row_past_last_row(tmp_path):
+    path = str(tmp_path / "sheet.xml")
+    write_sheet(path, 3, 100, tail=10)
+    size = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        assert find_row(f, size - 100) is None
+        assert find_row(f, size) is None
+
+
+def test_split_more_ranges_than_rows(tmp_path):
+    path = str(tmp_path / "sheet.xml")
+    write_sheet(path, 3, BLOCK_SIZE // 2, tail=BLOCK_SIZE // 10)
+
+    prefix, suffix, ranges = split_ranges(path, 1)
+
+    assert 1 <= len(ranges) <= 3
+    assert ranges[-1][1] == os.path.getsize(path)
+    with open(path, 'rb') as f:
+        for start, end in ranges[1:]:
+            f.seek(start)
+            assert f.read(4) == b'<row'
+
+
+# `get_sheet_names` of the reader
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_parallel_from_config(read, tmp_path):
+    from openpyxl import Workbook
+
+    from index.tracer import tracer
+
+    path = tmp_path / "a.xlsx"
+    book = Workbook()
+    for i in range(2000):
+        book.active.append([f"row{i}", i])
+    book.save(path)
+
+    serial = read(path)
+
+    trace = tmp_path / "trace.json"
+    tracer.enable(str(trace))
+    try:
+        parallel = read(path, {'parallel': '2', 'parallel_range': '0.01'})
+    finally:
+        tracer.close()
+
+    assert parallel == serial
+
+    events = [e for e in json.loads(trace.read_text()) if e['name'] == 'parse_range']
+    assert len(events) > 1
+    assert sum(e['args']['rows'] for e in events) == 2000